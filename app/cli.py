@@ -0,0 +1,293 @@
+"""Operational commands.
+
+    python -m app.cli backfill-note-counts [--user-id ID]
+    python -m app.cli import-notes --user-id ID --file PATH [--format ndjson|csv] [--job-id ID [--force]]
+    python -m app.cli send-emails [--once] [--api-url URL] [--batch-size N]
+    python -m app.cli purge-trash [--older-than-days N] [--batch-size N] [--max-batches N]
+    python -m app.cli purge-emails [--older-than-days N] [--batch-size N]
+    python -m app.cli process-attachments [--once] [--processes N] [--timeout SECONDS]
+    python -m app.cli sweep-uploads [--older-than-seconds N] [--batch-size N]
+    python -m app.cli profile-imports [--module app.main] [--budget-ms MS] [--repeat N] [--top N]
+    python -m app.cli write-schema-head [--migrations DIR]
+    python -m app.cli init-db
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_note_counts(args) -> int:
+    from app.db.database import get_sessionmaker
+    from app.services.note_counts import backfill_note_counts
+
+    with get_sessionmaker()() as db:
+        rows = backfill_note_counts(db, user_id=args.user_id)
+    logger.info("Rebuilt note_daily_counts: %s rows written", rows)
+    return 0
+
+
+async def _import_notes(args) -> int:
+    from app.db.database import get_async_sessionmaker
+    from app.db.models import ImportJob
+    from app.services.note_import import claim_import_job, create_import_job, run_import
+
+    import_format = args.format or os.path.splitext(args.file)[1].lstrip(".").lower()
+    if import_format not in ("ndjson", "csv"):
+        logger.error("Cannot tell the format of %s, pass --format ndjson or --format csv", args.file)
+        return 2
+
+    async def read_file():
+        with open(args.file, "rb") as source:
+            while chunk := source.read(1024 * 1024):
+                yield chunk
+
+    async with get_async_sessionmaker()() as db:
+        if args.job_id:
+            job = await db.get(ImportJob, args.job_id)
+            if job is None or job.user_id != args.user_id:
+                logger.error("Import job %s not found for user %s", args.job_id, args.user_id)
+                return 1
+        else:
+            job = await create_import_job(db, args.user_id, import_format, os.path.basename(args.file))
+            logger.info("Created import job %s; rerun with --job-id %s to resume", job.id, job.id)
+
+        if not await claim_import_job(db, job, force=args.force):
+            logger.error("Import job %s is %s", job.id, job.status)
+            return 1
+        await run_import(db, job, read_file())
+        logger.info("Import %s completed: %s notes imported, %s records rejected", job.id, job.rows_imported, job.rows_rejected)
+        for error in job.errors:
+            logger.warning(error)
+    return 0
+
+
+def import_notes(args) -> int:
+    return asyncio.run(_import_notes(args))
+
+
+def send_emails(args) -> int:
+    from app.core.config import get_config
+    from app.db.database import get_sessionmaker
+    from app.email_sender import BrevoClient
+    from app.services.email_outbox import run_worker
+
+    client = BrevoClient(api_url=args.api_url, timeout=get_config().EMAIL_HTTP_TIMEOUT_SECONDS)
+    try:
+        attempted = run_worker(get_sessionmaker(), client, once=args.once, batch_size=args.batch_size)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        client.close()
+    logger.info("Email outbox drained: %s emails attempted", attempted)
+    return 0
+
+
+def purge_trash(args) -> int:
+    from datetime import timedelta
+    from app.core.config import get_config
+    from app.db.database import get_sessionmaker
+    from app.services.note_trash import purge_trash
+
+    config = get_config()
+    older_than_days = config.TRASH_RETENTION_DAYS if args.older_than_days is None else args.older_than_days
+    with get_sessionmaker()() as db:
+        purged = purge_trash(
+            db,
+            timedelta(days=older_than_days),
+            batch_size=args.batch_size or config.TRASH_PURGE_BATCH_SIZE,
+            max_batches=args.max_batches,
+            lock_timeout_ms=config.TRASH_PURGE_LOCK_TIMEOUT_MS,
+        )
+    logger.info("Purged %s notes deleted more than %s days ago", purged, older_than_days)
+    return 0
+
+
+def purge_emails(args) -> int:
+    from datetime import timedelta
+    from app.core.config import get_config
+    from app.db.database import get_sessionmaker
+    from app.services.email_outbox import purge_emails
+
+    older_than_days = get_config().EMAIL_RETENTION_DAYS if args.older_than_days is None else args.older_than_days
+    with get_sessionmaker()() as db:
+        purged = purge_emails(db, timedelta(days=older_than_days), batch_size=args.batch_size)
+    logger.info("Purged %s sent or failed emails older than %s days", purged, older_than_days)
+    return 0
+
+
+def process_attachments(args) -> int:
+    from app.core.config import get_config
+    from app.db.database import get_sessionmaker
+    from app.services.attachment_jobs import run_worker
+
+    if not get_config().ATTACHMENT_BUCKET:
+        logger.error("ATTACHMENT_BUCKET is not set")
+        return 1
+    try:
+        processed = run_worker(get_sessionmaker(), processes=args.processes, once=args.once, timeout=args.timeout)
+    except KeyboardInterrupt:
+        return 0
+    logger.info("Attachment jobs done: %s processed", processed)
+    return 0
+
+
+def sweep_uploads(args) -> int:
+    from datetime import timedelta
+    from app.core.config import get_config
+    from app.db.database import get_sessionmaker
+    from app.services.attachment_uploads import SWEEP_GRACE_SECONDS, sweep_abandoned_uploads
+
+    config = get_config()
+    if not config.ATTACHMENT_BUCKET:
+        logger.error("ATTACHMENT_BUCKET is not set")
+        return 1
+    older_than = args.older_than_seconds
+    if older_than is None:
+        older_than = config.ATTACHMENT_URL_EXPIRES_SECONDS + SWEEP_GRACE_SECONDS
+    with get_sessionmaker()() as db:
+        swept = sweep_abandoned_uploads(db, timedelta(seconds=older_than), batch_size=args.batch_size)
+    logger.info("Deleted %s uploads left pending for more than %s seconds", swept, older_than)
+    return 0
+
+
+def _measure_import(module: str) -> tuple[float, list[tuple[int, int, str]]]:
+    """Import `module` in a fresh interpreter; returns (milliseconds, [(self_us, cumulative_us, name)])."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = (field.strip() for field in line[len("import time:"):].split("|"))
+        if self_us.isdigit():  # Skip the header row
+            modules.append((int(self_us), int(cumulative_us), name))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def profile_imports(args) -> int:
+    timings = []
+    for _ in range(args.repeat):
+        try:
+            elapsed_ms, modules = _measure_import(args.module)
+        except subprocess.CalledProcessError as e:
+            logger.error("Importing %s failed:\n%s", args.module, e.stderr.strip().splitlines()[-1] if e.stderr else e)
+            return 1
+        timings.append(elapsed_ms)
+
+    median_ms = statistics.median(timings)
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.repeat} runs ({', '.join(f'{t:.0f}' for t in timings)})")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for self_us, cumulative_us, name in sorted(modules, key=lambda module: module[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+    if args.budget_ms and median_ms > args.budget_ms:
+        logger.error("import %s took %.0f ms, over the %s ms budget", args.module, median_ms, args.budget_ms)
+        return 1
+    return 0
+
+
+def write_schema_head(args) -> int:
+    from pathlib import Path
+    from app.db.schema import HEAD_FILE, MIGRATIONS_DIR, write_head_file
+
+    heads = write_head_file(Path(args.migrations) if args.migrations else MIGRATIONS_DIR)
+    logger.info("Wrote expected schema head %s to %s", ", ".join(sorted(heads)), HEAD_FILE)
+    return 0
+
+
+def init_db(args) -> int:
+    from app.db.schema import create_schema
+
+    try:
+        heads = create_schema()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    logger.info("Created all tables and stamped the database at %s", ", ".join(sorted(heads)))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Cloudnotes API operational commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-note-counts", help="Rebuild note_daily_counts from notes")
+    backfill.add_argument("--user-id", type=int, default=None, help="Only rebuild counts for this user")
+    backfill.set_defaults(func=backfill_note_counts)
+
+    importer = commands.add_parser("import-notes", help="Bulk import notes for a user from an NDJSON or CSV file")
+    importer.add_argument("--user-id", type=int, required=True)
+    importer.add_argument("--file", required=True, help="Path to the .ndjson or .csv file")
+    importer.add_argument("--format", choices=("ndjson", "csv"), default=None, help="Defaults to the file extension")
+    importer.add_argument("--job-id", default=None, help="Resume this import job from its checkpoint")
+    importer.add_argument("--force", action="store_true", help="Resume even if the job still looks running (its process died)")
+    importer.set_defaults(func=import_notes)
+
+    emails = commands.add_parser("send-emails", help="Deliver queued emails from email_outbox through Brevo")
+    emails.add_argument("--once", action="store_true", help="Exit once no email is due instead of polling")
+    emails.add_argument("--api-url", default=None, help="Brevo endpoint, e.g. a local stand-in (defaults to BREVO_API_URL)")
+    emails.add_argument("--batch-size", type=int, default=None, help="Emails per Brevo request (defaults to EMAIL_BATCH_SIZE)")
+    emails.set_defaults(func=send_emails)
+
+    purge = commands.add_parser("purge-trash", help="Permanently delete notes that have been in the trash too long")
+    purge.add_argument("--older-than-days", type=int, default=None, help="Defaults to TRASH_RETENTION_DAYS")
+    purge.add_argument("--batch-size", type=int, default=None, help="Notes per transaction (defaults to TRASH_PURGE_BATCH_SIZE)")
+    purge.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches (default: until done)")
+    purge.set_defaults(func=purge_trash)
+
+    purge_outbox = commands.add_parser("purge-emails", help="Delete sent and failed emails from email_outbox")
+    purge_outbox.add_argument("--older-than-days", type=int, default=None, help="Defaults to EMAIL_RETENTION_DAYS")
+    purge_outbox.add_argument("--batch-size", type=int, default=500, help="Emails per transaction (default: 500)")
+    purge_outbox.set_defaults(func=purge_emails)
+
+    attachments = commands.add_parser("process-attachments", help="Make thumbnails and extract text of uploaded attachments")
+    attachments.add_argument("--once", action="store_true", help="Exit once no job is due instead of polling")
+    attachments.add_argument("--processes", type=int, default=None, help="Pool size (defaults to ATTACHMENT_WORKER_PROCESSES)")
+    attachments.add_argument("--timeout", type=float, default=None, help="Seconds per job (defaults to ATTACHMENT_JOB_TIMEOUT_SECONDS)")
+    attachments.set_defaults(func=process_attachments)
+
+    sweep = commands.add_parser("sweep-uploads", help="Delete attachment uploads that were never completed, and their S3 objects")
+    sweep.add_argument(
+        "--older-than-seconds", type=int, default=None,
+        help="Defaults to ATTACHMENT_URL_EXPIRES_SECONDS plus an hour for uploads still in flight",
+    )
+    sweep.add_argument("--batch-size", type=int, default=500, help="Attachments per transaction (default: 500)")
+    sweep.set_defaults(func=sweep_uploads)
+
+    imports = commands.add_parser("profile-imports", help="Measure cold-start import time in a fresh interpreter")
+    imports.add_argument("--module", default="app.main", help="Module to import (default: app.main)")
+    imports.add_argument("--budget-ms", type=float, default=None, help="Exit with status 1 if the median import time is above this")
+    imports.add_argument("--repeat", type=int, default=3, help="Number of fresh interpreters to time (default: 3)")
+    imports.add_argument("--top", type=int, default=15, help="Slowest modules to list by cumulative time (default: 15)")
+    imports.set_defaults(func=profile_imports)
+
+    schema_head = commands.add_parser("write-schema-head", help="Record the migration head the startup schema check expects")
+    schema_head.add_argument("--migrations", default=None, help="Alembic migrations directory (default: ./migrations)")
+    schema_head.set_defaults(func=write_schema_head)
+
+    init = commands.add_parser("init-db", help="Create all tables on an empty database and stamp it at the migration head")
+    init.set_defaults(func=init_db)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
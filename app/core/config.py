@@ -1,10 +1,7 @@
 import os
 from functools import lru_cache
-from typing import ClassVar
 from pydantic_settings import BaseSettings
-from passlib.context import CryptContext
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.database import Base,engine
 
 def init_cors(app):
     """Initialize CORS settings for the FastAPI application."""
@@ -16,16 +13,13 @@ def init_cors(app):
         allow_credentials=True, 
         allow_methods=["*"],  # ✅ Allow all methods
         allow_headers=["*"],  # ✅ Allow all headers
-        expose_headers=["*"],  # ✅ Expose all headers
+        # "*" is not honoured on credentialed requests, so list the headers clients read explicitly
+        expose_headers=["*", "ETag", "Last-Modified", "Retry-After", "Server-Timing"],  # ✅ Expose all headers
         max_age=600,  # Cache preflight requests for 10 minutes
     )
    # Debugging Log
     print(f"✅ CORS Allowed Origins: {config.allowed_origins}")  # 🛠 Debugging
     
-def init_db():
-    """Initialize the database and create tables."""
-    Base.metadata.create_all(bind=engine)
-
 class Config(BaseSettings):
     """Configuration settings for the application."""
     
@@ -36,7 +30,103 @@ class Config(BaseSettings):
     BASE_URL: str = os.getenv("BASE_URL", "http://localhost:8000")
     FRONTEND_URLS: str = os.getenv("FRONTEND_URLS", "https://platform.cloudnotes.click,https://cloudnotes.click")
     ALGORITHM:str = os.getenv("ALGORITHM", "HS256")
-    PWD_CONTEXT: ClassVar[CryptContext] = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    # Database connection management: "server" (QueuePool), "proxy" (NullPool, e.g. behind RDS Proxy)
+    # or "lambda" (one connection per container, reused across invocations)
+    DB_POOL_MODE: str = os.getenv("DB_POOL_MODE", "lambda" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "server")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Keep below the server/RDS idle timeout
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_LAMBDA_PING_IDLE_SECONDS: int = int(os.getenv("DB_LAMBDA_PING_IDLE_SECONDS", 60))
+    # Startup schema version check: "warn" logs a mismatch, "strict" refuses to start, "off" skips it
+    SCHEMA_CHECK: str = os.getenv("SCHEMA_CHECK", "warn")
+
+    # Per-process cache of authenticated users (token subject -> user snapshot)
+    IDENTITY_CACHE_SIZE: int = int(os.getenv("IDENTITY_CACHE_SIZE", 1024))
+    IDENTITY_CACHE_TTL_SECONDS: int = int(os.getenv("IDENTITY_CACHE_TTL_SECONDS", 60))
+    # Already-verified bearer tokens (sha256 digest -> subject), each kept until its exp claim
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+    # Per-process cache of category ids by (user, name)
+    CATEGORY_CACHE_SIZE: int = int(os.getenv("CATEGORY_CACHE_SIZE", 4096))
+    CATEGORY_CACHE_TTL_SECONDS: int = int(os.getenv("CATEGORY_CACHE_TTL_SECONDS", 300))
+
+    # Password hashing service: bcrypt runs in a process pool (threads on Lambda, which has no /dev/shm)
+    HASH_EXECUTOR: str = os.getenv("HASH_EXECUTOR", "thread" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "process")
+    HASH_MAX_CONCURRENCY: int = int(os.getenv("HASH_MAX_CONCURRENCY", os.cpu_count() or 1))
+    HASH_MAX_QUEUE: int = int(os.getenv("HASH_MAX_QUEUE", 64))
+    HASH_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("HASH_QUEUE_TIMEOUT_SECONDS", 5))
+
+    # Token-bucket limits on login, registration and password-reset requests, per client IP and per
+    # account (email; for login, email and client IP): "<requests>/<seconds>", "" for no limit.
+    # Buckets are kept per process.
+    # RATE_LIMIT_TRUSTED_PROXIES: proxies in front of the app that append to X-Forwarded-For
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_LOGIN_PER_IP: str = os.getenv("RATE_LIMIT_LOGIN_PER_IP", "20/60")
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: str = os.getenv("RATE_LIMIT_LOGIN_PER_ACCOUNT", "10/300")
+    RATE_LIMIT_REGISTER_PER_IP: str = os.getenv("RATE_LIMIT_REGISTER_PER_IP", "10/600")
+    RATE_LIMIT_REGISTER_PER_ACCOUNT: str = os.getenv("RATE_LIMIT_REGISTER_PER_ACCOUNT", "3/600")
+    RATE_LIMIT_RESET_PER_IP: str = os.getenv("RATE_LIMIT_RESET_PER_IP", "10/600")
+    RATE_LIMIT_RESET_PER_ACCOUNT: str = os.getenv("RATE_LIMIT_RESET_PER_ACCOUNT", "3/900")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+    RATE_LIMIT_TRUSTED_PROXIES: int = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 0))
+
+    # Full-text search ranks at most this many of a user's most recent matching notes
+    SEARCH_CANDIDATE_LIMIT: int = int(os.getenv("SEARCH_CANDIDATE_LIMIT", 1000))
+
+    # Note export streams EXPORT_YIELD_PER rows at a time. Mangum buffers the whole response
+    # (Lambda payloads are capped at 6 MB), so exports there are limited to EXPORT_MAX_ROWS; 0 = no limit
+    EXPORT_YIELD_PER: int = int(os.getenv("EXPORT_YIELD_PER", 1000))
+    EXPORT_MAX_ROWS: int = int(os.getenv("EXPORT_MAX_ROWS", 5000 if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else 0))
+
+    # Note import loads and checkpoints this many source records per transaction
+    IMPORT_CHUNK_SIZE: int = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+
+    # Email outbox worker: messages per Brevo request, retry schedule and polling
+    EMAIL_BATCH_SIZE: int = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))
+    EMAIL_RETRY_BASE_SECONDS: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+    EMAIL_RETRY_MAX_SECONDS: float = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+    EMAIL_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("EMAIL_HTTP_TIMEOUT_SECONDS", 10))
+    EMAIL_POLL_SECONDS: float = float(os.getenv("EMAIL_POLL_SECONDS", 5))
+    # purge-emails deletes sent and failed emails older than this
+    EMAIL_RETENTION_DAYS: int = int(os.getenv("EMAIL_RETENTION_DAYS", 7))
+
+    # Trash purge: notes deleted longer ago than this are removed for good, in batches of
+    # TRASH_PURGE_BATCH_SIZE; a batch gives up after TRASH_PURGE_LOCK_TIMEOUT_MS waiting on a lock
+    TRASH_RETENTION_DAYS: int = int(os.getenv("TRASH_RETENTION_DAYS", 30))
+    TRASH_PURGE_BATCH_SIZE: int = int(os.getenv("TRASH_PURGE_BATCH_SIZE", 500))
+    TRASH_PURGE_LOCK_TIMEOUT_MS: int = int(os.getenv("TRASH_PURGE_LOCK_TIMEOUT_MS", 1000))
+
+    # Attachments: clients upload straight to S3 with presigned URLs, multipart above the threshold.
+    # S3_ENDPOINT_URL points at an S3-compatible stand-in (MinIO, LocalStack, moto) instead of AWS
+    ATTACHMENT_BUCKET: str = os.getenv("ATTACHMENT_BUCKET", "")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")
+    S3_REGION: str = os.getenv("S3_REGION", os.getenv("AWS_REGION", "us-east-1"))
+    ATTACHMENT_URL_EXPIRES_SECONDS: int = int(os.getenv("ATTACHMENT_URL_EXPIRES_SECONDS", 900))
+    ATTACHMENT_MAX_BYTES: int = int(os.getenv("ATTACHMENT_MAX_BYTES", 1024 ** 3))  # attachments.file_size is 32-bit: keep below 2 GiB
+    ATTACHMENT_MULTIPART_THRESHOLD: int = int(os.getenv("ATTACHMENT_MULTIPART_THRESHOLD", 64 * 1024 ** 2))
+    ATTACHMENT_PART_SIZE: int = int(os.getenv("ATTACHMENT_PART_SIZE", 16 * 1024 ** 2))
+
+    # Attachment processing worker (thumbnails, text extraction): one process per job, each job
+    # stopped after ATTACHMENT_JOB_TIMEOUT_SECONDS. Files above ATTACHMENT_PROCESS_MAX_BYTES only
+    # get their size and type checked; at most ATTACHMENT_TEXT_MAX_CHARS of text is kept per note
+    ATTACHMENT_WORKER_PROCESSES: int = int(os.getenv("ATTACHMENT_WORKER_PROCESSES", os.cpu_count() or 1))
+    ATTACHMENT_JOB_TIMEOUT_SECONDS: float = float(os.getenv("ATTACHMENT_JOB_TIMEOUT_SECONDS", 120))
+    ATTACHMENT_JOB_MAX_ATTEMPTS: int = int(os.getenv("ATTACHMENT_JOB_MAX_ATTEMPTS", 5))
+    ATTACHMENT_JOB_POLL_SECONDS: float = float(os.getenv("ATTACHMENT_JOB_POLL_SECONDS", 5))
+    ATTACHMENT_PROCESS_MAX_BYTES: int = int(os.getenv("ATTACHMENT_PROCESS_MAX_BYTES", 50 * 1024 ** 2))
+    ATTACHMENT_TEXT_MAX_CHARS: int = int(os.getenv("ATTACHMENT_TEXT_MAX_CHARS", 100_000))
+    ATTACHMENT_THUMBNAIL_SIZE: int = int(os.getenv("ATTACHMENT_THUMBNAIL_SIZE", 256))
+
+    # Request metrics: "prometheus" (served at /metrics), "emf" (CloudWatch Embedded Metric Format
+    # lines on stdout, the default on Lambda) or "off"; Server-Timing headers on responses
+    METRICS_MODE: str = os.getenv("METRICS_MODE", "emf" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "prometheus")
+    METRICS_NAMESPACE: str = os.getenv("METRICS_NAMESPACE", "Cloudnotes/API")
+    # /metrics answers 404 until this is set, then only requests with "Authorization: Bearer <token>"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "true").lower() == "true"
 
     allowed_origins: list[str] = []
 
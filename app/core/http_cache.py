@@ -0,0 +1,48 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+
+# Clients may keep a copy but must revalidate it on every poll; the payload is per user
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag from the values a response is derived from (a version, not a body hash)."""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match lists `etag` (weak comparison) or is `*`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    if "*" in candidates:
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.removeprefix("W/") == opaque for candidate in candidates)
+
+
+def _http_date(value: datetime) -> str:
+    # Timestamps are stored as naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    """Attach ETag, Last-Modified and Cache-Control to a response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = _http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Empty 304 response carrying the same validators as the full one."""
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
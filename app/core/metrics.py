@@ -0,0 +1,230 @@
+"""Per-request latency and database metrics.
+
+MetricsMiddleware times every HTTP request and, through a context variable, collects the
+number and duration of the SQL statements it ran (record_query is called from the engine's
+cursor events). Each response gets a Server-Timing header. Totals are kept per route in
+process memory and served as Prometheus text (render_prometheus), or, on Lambda where a
+scrape would only reach one container, written to stdout as CloudWatch Embedded Metric
+Format lines that CloudWatch turns into metrics. Requests turned away by a rate limit are
+counted the same way (record_rate_limited).
+"""
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from app.core.config import get_config
+
+METRICS_PROMETHEUS = "prometheus"
+METRICS_EMF = "emf"
+METRICS_OFF = "off"
+
+# Upper bounds in seconds (the Prometheus client's defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+UNMATCHED_ROUTE = "unmatched"  # Never label by raw path: one series per URL would grow without bound
+
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def record_query(seconds: float) -> None:
+    """Count one SQL statement against the current request, if there is one."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+class _RouteMetrics:
+    __slots__ = ("buckets", "count", "seconds", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # The last one is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Request totals per (method, route, status), for the life of the process."""
+
+    def __init__(self):
+        self._routes: dict[tuple[str, str, str], _RouteMetrics] = {}
+        self._rate_limited: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route, str(status))
+        with self._lock:
+            metrics = self._routes.get(key)
+            if metrics is None:
+                metrics = self._routes[key] = _RouteMetrics()
+            metrics.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            metrics.count += 1
+            metrics.seconds += seconds
+            metrics.db_queries += stats.db_queries
+            metrics.db_seconds += stats.db_seconds
+
+    def observe_rate_limited(self, action: str, scope: str) -> None:
+        with self._lock:
+            self._rate_limited[action, scope] = self._rate_limited.get((action, scope), 0) + 1
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            snapshot = [(key, list(m.buckets), m.count, m.seconds, m.db_queries, m.db_seconds) for key, m in routes]
+            rate_limited = sorted(self._rate_limited.items())
+
+        lines = [
+            "# HELP http_request_duration_seconds Time to serve an HTTP request.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), buckets, count, seconds, _, _ in snapshot:
+            labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += bucket
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        for name, position, help_text, fmt in (
+            ("http_request_db_queries_total", 4, "SQL statements run while serving HTTP requests.", "{}"),
+            ("http_request_db_duration_seconds_total", 5, "Time spent in SQL statements while serving HTTP requests.", "{:.6f}"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for row in snapshot:
+                method, route, status = row[0]
+                labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+                lines.append(f"{name}{{{labels}}} {fmt.format(row[position])}")
+
+        lines.append("# HELP http_rate_limited_total Requests rejected by a rate limit, by action and the limit (ip or account) hit.")
+        lines.append("# TYPE http_rate_limited_total counter")
+        for (action, scope), count in rate_limited:
+            lines.append(f'http_rate_limited_total{{action="{_escape(action)}",scope="{scope}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+def emf_line(namespace: str, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> str:
+    """One request as a CloudWatch Embedded Metric Format record."""
+    return json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [["Route", "Method"]],
+                "Metrics": [
+                    {"Name": "Latency", "Unit": "Milliseconds"},
+                    {"Name": "DbQueries", "Unit": "Count"},
+                    {"Name": "DbTime", "Unit": "Milliseconds"},
+                ],
+            }],
+        },
+        "Route": route,
+        "Method": method,
+        "Status": status,  # Not a dimension: searchable in Logs Insights without multiplying series
+        "Latency": round(seconds * 1000, 3),
+        "DbQueries": stats.db_queries,
+        "DbTime": round(stats.db_seconds * 1000, 3),
+    }, separators=(",", ":"))
+
+
+def rate_limited_emf_line(namespace: str, action: str, scope: str) -> str:
+    return json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [["Action", "Scope"]],
+                "Metrics": [{"Name": "RateLimited", "Unit": "Count"}],
+            }],
+        },
+        "Action": action,
+        "Scope": scope,
+        "RateLimited": 1,
+    }, separators=(",", ":"))
+
+
+def record_rate_limited(action: str, scope: str) -> None:
+    """Count a request rejected by the `scope` ("ip" or "account") limit on `action`."""
+    config = get_config()
+    if config.METRICS_MODE == METRICS_OFF:
+        return
+    registry.observe_rate_limited(action, scope)
+    if config.METRICS_MODE == METRICS_EMF:
+        sys.stdout.write(rate_limited_emf_line(config.METRICS_NAMESPACE, action, scope) + "\n")
+        sys.stdout.flush()
+
+
+def server_timing(total_seconds: float, stats: RequestStats) -> str:
+    return (
+        f"app;dur={total_seconds * 1000:.1f}, "
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries"'
+    )
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware, so streamed responses stay streamed)."""
+
+    def __init__(self, app):
+        self.app = app
+        config = get_config()
+        self.mode = config.METRICS_MODE
+        self.namespace = config.METRICS_NAMESPACE
+        self.server_timing = config.SERVER_TIMING
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == METRICS_OFF:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    # Handlers have finished by now, except for the body of a streamed response
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(time.perf_counter() - started, stats).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            seconds = time.perf_counter() - started
+            route = scope.get("route")  # Set by the router on the shared scope once a route matched
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            registry.observe(scope["method"], route_path, status, seconds, stats)
+            if self.mode == METRICS_EMF:
+                sys.stdout.write(emf_line(self.namespace, scope["method"], route_path, status, seconds, stats) + "\n")
+                sys.stdout.flush()
@@ -1,39 +1,182 @@
 import os
-from sqlalchemy import create_engine
+import time
+from functools import lru_cache
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DisconnectionError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from dotenv import load_dotenv
+from app.core.config import get_config
+from app.core.metrics import record_query
 
 # Load environment variables from .env
 load_dotenv()
 
-# Fetch DB credentials from environment variables
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+# Connection management modes (Config.DB_POOL_MODE)
+POOL_MODE_SERVER = "server"   # long-lived process: QueuePool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW
+POOL_MODE_PROXY = "proxy"     # pooling is done elsewhere (RDS Proxy, pgbouncer): NullPool
+POOL_MODE_LAMBDA = "lambda"   # one connection per container, kept warm across invocations
+POOL_MODES = (POOL_MODE_SERVER, POOL_MODE_PROXY, POOL_MODE_LAMBDA)
 
-# Ensure all environment variables are set
-if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]):
-    raise ValueError("Missing one or more required database environment variables.")
 
+def _install_idle_ping(engine, idle_seconds: int):
+    """Validate a pooled connection on checkout only if it sat idle for longer than `idle_seconds`.
 
-# PostgreSQL Database URL
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    A warm Lambda container reuses its connection back to back, so pinging on every
+    checkout (pool_pre_ping) would add a round trip to each invocation. After a long
+    freeze the server or RDS may have dropped the socket, so that is when we check.
+    """
+    @event.listens_for(engine, "checkin")
+    def _stamp_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.time()
 
-# Create SQLAlchemy Engine
-engine = create_engine(DATABASE_URL, connect_args={"options": "-c timezone=UTC"})
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin")
+        if last_checkin is None or time.time() - last_checkin < idle_seconds:
+            return
+
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            # Makes the pool discard this connection and retry with a fresh one
+            raise DisconnectionError(f"Stale connection after {int(time.time() - last_checkin)}s idle") from e
+        finally:
+            cursor.close()
+
+
+def _install_query_timing(engine):
+    """Report every statement's duration to the metrics of the request that ran it."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            record_query(time.perf_counter() - started)
+
+
+def _engine_options(config) -> dict:
+    """Pool keyword arguments for create_engine / create_async_engine for the configured mode."""
+    mode = config.DB_POOL_MODE
+    if mode not in POOL_MODES:
+        raise ValueError(f"Invalid DB_POOL_MODE '{mode}'. Expected one of: {', '.join(POOL_MODES)}")
+
+    if mode == POOL_MODE_PROXY:
+        return {"poolclass": NullPool}
+
+    if mode == POOL_MODE_LAMBDA:
+        # A container serves one invocation at a time, so a single connection is enough.
+        # Pre-ping is replaced by the idle-aware check installed in create_db_engine.
+        return {
+            "pool_size": 1,
+            "max_overflow": 0,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+            "pool_recycle": config.DB_POOL_RECYCLE,
+            "pool_pre_ping": False,
+        }
+
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def create_db_engine(url: str, is_async: bool = False, config=None):
+    """Create a sync or async engine using the connection management mode from Config."""
+    config = config or get_config()
+    options = _engine_options(config)
+
+    if is_async:
+        engine = create_async_engine(url, connect_args={"server_settings": {"timezone": "UTC"}}, **options)
+        pool_target = engine.sync_engine
+    else:
+        engine = create_engine(url, connect_args={"options": "-c timezone=UTC"}, **options)
+        pool_target = engine
+
+    if config.DB_POOL_MODE == POOL_MODE_LAMBDA and config.DB_POOL_PRE_PING:
+        _install_idle_ping(pool_target, config.DB_LAMBDA_PING_IDLE_SECONDS)
+    _install_query_timing(pool_target)
+    return engine
+
+
+def database_urls() -> tuple[str, str]:
+    """(sync, async) PostgreSQL URLs from the DB_* environment variables."""
+    db_host = os.getenv("DB_HOST")
+    db_port = os.getenv("DB_PORT")
+    db_name = os.getenv("DB_NAME")
+    db_user = os.getenv("DB_USER")
+    db_password = os.getenv("DB_PASSWORD")
+
+    # Ensure all environment variables are set
+    if not all([db_host, db_port, db_name, db_user, db_password]):
+        raise ValueError("Missing one or more required database environment variables.")
+
+    credentials = f"{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    return f"postgresql://{credentials}", f"postgresql+asyncpg://{credentials}"
+
+
+# Engines and session factories are created on first use rather than at import, so
+# importing the app (a Lambda cold start, a CLI command) does not pay for them up front.
+@lru_cache
+def get_engine():
+    return create_db_engine(database_urls()[0])
+
+
+@lru_cache
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+# Async engine used by the API routes; requests wait on Postgres without holding a worker thread
+@lru_cache
+def get_async_engine():
+    return create_db_engine(database_urls()[1], is_async=True)
+
+
+# Objects stay usable after commit, lazy loads are not allowed in async code
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(bind=get_async_engine(), class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+    "DATABASE_URL": lambda: database_urls()[0],
+    "ASYNC_DATABASE_URL": lambda: database_urls()[1],
+}
+
+
+def __getattr__(name):
+    # Keeps `from app.db.database import engine, SessionLocal, ...` working, created on access
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Session Local
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
 
 # Dependency for database session in FastAPI
 def get_db():
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
         db.close()
+
+# Async dependency for database session in FastAPI
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
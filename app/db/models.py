@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Boolean, TIMESTAMP, Text, Index, JSON
+from sqlalchemy import Column, Computed, Date, DateTime, ForeignKey, Integer, String, Boolean, TIMESTAMP, Text, Index, JSON, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 import ulid
 from app.db.database import Base
 import re
@@ -61,6 +62,10 @@ class Category(Base):
     notes = relationship("Note", back_populates="category")
     color = relationship("Color", back_populates="categories")
 
+    __table_args__ = (
+        UniqueConstraint('user_id', 'name', name='uq_category_user_name'),
+    )
+
 class Note(Base):
     __tablename__ = "notes"
     
@@ -76,17 +81,107 @@ class Note(Base):
     pinned = Column(Boolean, default=False)
     order_index = Column(Integer, nullable=False, default=0)
     
-    is_deleted = Column(Boolean, default=False)
+    # A deleted note sits in the trash until purge-trash removes it; an archived one is kept
+    # but hidden. Neither is counted in note_daily_counts (see app/services/note_trash.py).
+    is_deleted = Column(Boolean, nullable=False, default=False, server_default=text("false"))
     deleted_at = Column(TIMESTAMP, nullable=True)
-    is_archived = Column(Boolean, default=False)
+    is_archived = Column(Boolean, nullable=False, default=False, server_default=text("false"))
     
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Text extracted from the note's attachments by the processing worker, searched with
+    # a lower weight than the note itself
+    attachment_text = deferred(Column(Text, nullable=True))
+
+    # Maintained by Postgres on every write; deferred so regular note loads never fetch it
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(attachment_text, '')), 'C')",
+            persisted=True,
+        ),
+    ))
     
     user = relationship("User", back_populates="notes")
     category = relationship("Category", back_populates="notes")
     attachments = relationship("Attachment", back_populates="note", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Hot reads only ever see live notes, so these skip trashed and archived rows
+        # (per-user day/month range reads and ordering within a day; full-text search)
+        Index('idx_note_live_user_date_order', 'user_id', 'date', 'order_index',
+              postgresql_where=text("NOT is_deleted AND NOT is_archived")),
+        Index('idx_note_live_search_vector', 'search_vector', postgresql_using='gin',
+              postgresql_where=text("NOT is_deleted AND NOT is_archived")),
+        # Finds expired trash for the purge
+        Index('idx_note_trash', 'deleted_at', postgresql_where=text("is_deleted")),
+    )
+
+class NoteDailyCount(Base):
+    """Number of notes per user, day and category, kept in step with every note write."""
+    __tablename__ = "note_daily_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    # Category ULID, or "uncategorized" for notes without one. Not a foreign key:
+    # rows for a deleted category are reported as uncategorized when read.
+    category_id = Column(String(26), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ImportJob(Base):
+    """Progress of one bulk note import. The first `rows_read` source records are committed,
+    so an interrupted import resumes by skipping that many records of the same file."""
+    __tablename__ = "import_jobs"
+
+    id = Column(String(26), primary_key=True, default=lambda: ulid.new().str)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    format = Column(String(10), nullable=False)  # ndjson or csv
+    source = Column(String(255), nullable=True)  # File name, for display only
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, interrupted, failed
+
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)  # First validation errors, "record N: message"
+
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        Index('idx_import_job_user', 'user_id'),
+    )
+
+class EmailOutbox(Base):
+    """Transactional emails waiting to be delivered by the outbox worker.
+
+    Rows are written in the same transaction as the change that triggers the email,
+    so an email is never lost or sent for a change that rolled back.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String(100), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_content = Column(Text, nullable=False)
+
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    message_id = Column(String(255), nullable=True)  # Brevo message id once sent
+
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    sent_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        # The worker only ever scans due rows: pending, or sending with an expired lease
+        Index('idx_email_outbox_due', 'next_attempt_at', postgresql_where=text("status IN ('pending', 'sending')")),
+    )
+
 class Attachment(Base):
     __tablename__ = "attachments"
     
@@ -100,12 +195,49 @@ class Attachment(Base):
     file_url = Column(String, nullable=True)
     
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    # Object key in ATTACHMENT_BUCKET. An upload stays "pending" (and hidden) until the client
+    # confirms it and a HEAD request finds the object; upload_id is set for multipart uploads
+    storage_key = Column(String(1024), nullable=True)
+    status = Column(String(10), nullable=False, default="uploaded", server_default="uploaded")
+    upload_id = Column(String(1024), nullable=True)
+
+    # Written by the processing worker (app/services/attachment_jobs.py)
+    thumbnail_key = Column(String(1024), nullable=True)
+    extracted_text = deferred(Column(Text, nullable=True))
+    processed_at = Column(TIMESTAMP, nullable=True)
     
     note = relationship("Note", back_populates="attachments")
     
     __table_args__ = (
         Index('idx_attachment_note', 'note_id'),
         Index('idx_attachment_storage', 'storage_type'),
+        # sweep-uploads only looks at pending uploads, by age
+        Index('idx_attachment_pending', 'created_at', postgresql_where=text("status = 'pending'")),
+    )
+
+class AttachmentJob(Base):
+    """Processing of one uploaded attachment (size/type check, thumbnail, text extraction).
+
+    Claimed by workers with FOR UPDATE SKIP LOCKED. A running job holds a lease until
+    next_attempt_at; if its worker dies the job becomes due again once the lease runs out.
+    """
+    __tablename__ = "attachment_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    attachment_id = Column(String(26), ForeignKey("attachments.id", ondelete="CASCADE"), nullable=False, unique=True)
+
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan jobs that are due: pending ones, and running ones whose lease ran out
+        Index('idx_attachment_jobs_due', 'next_attempt_at', postgresql_where=text("status IN ('pending', 'running')")),
     )
 
 class Color(Base):
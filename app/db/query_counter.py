@@ -0,0 +1,125 @@
+"""Count the SQL statements a block of code runs, and name the lazy loads among them.
+
+    with count_queries() as log:
+        response = await call_the_route()
+    log.assert_within(3, "GET /v1/notes/categories")
+
+Statements are seen through engine-level cursor events, so anything that reaches the
+database is counted whichever engine or session ran it. Loads of unloaded relationships
+or expired/deferred columns are caught with the ORM's do_orm_execute event and attached
+to the statement they issue, so an overrun says which attribute caused it. Only code
+running in the same context (task or thread) as the block is counted.
+
+Endpoints declare their budget with @query_budget(n); benchmarks/query_budgets.py calls
+every budgeted route and checks it.
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, NamedTuple, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A block ran more SQL statements than its budget."""
+
+
+class Statement(NamedTuple):
+    sql: str
+    origin: Optional[str]  # e.g. "lazy load of Category.color", None for explicit queries
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: list[Statement] = []
+        self._pending_origin: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    @property
+    def lazy_loads(self) -> Counter:
+        """Statements issued by attribute loads, by origin."""
+        return Counter(statement.origin for statement in self.statements if statement.origin)
+
+    def describe(self, budget: int, label: str) -> str:
+        message = f"{label} ran {len(self)} SQL statements, budget is {budget}"
+        if self.lazy_loads:
+            return message + "; caused by " + ", ".join(
+                f"{origin} x{count}" for origin, count in self.lazy_loads.most_common()
+            )
+        statements = "\n".join(f"  {' '.join(statement.sql.split())[:200]}" for statement in self.statements)
+        return f"{message}; no lazy loads, statements:\n{statements}"
+
+    def assert_within(self, budget: int, label: str = "block") -> None:
+        if len(self) > budget:
+            raise QueryBudgetExceeded(self.describe(budget, label))
+
+
+_active_log: ContextVar[Optional[QueryLog]] = ContextVar("active_query_log", default=None)
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _on_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _active_log.get()
+    if log is not None:
+        log.statements.append(Statement(statement, log._pending_origin))
+        log._pending_origin = None
+
+
+def _on_orm_execute(orm_execute_state):
+    log = _active_log.get()
+    if log is None or not orm_execute_state.is_select:
+        return
+    if orm_execute_state.lazy_loaded_from is not None:
+        path = orm_execute_state.loader_strategy_path
+        log._pending_origin = f"lazy load of {path[-1] if path else 'a relationship'}"
+    elif orm_execute_state.is_column_load:
+        mapper = orm_execute_state.bind_mapper
+        log._pending_origin = f"load of unloaded {mapper.class_.__name__} columns" if mapper else "column load"
+
+
+def _install() -> None:
+    global _installed
+    with _install_lock:
+        if not _installed:
+            # Class-level listeners apply to every Engine (async engines run on one) and Session
+            event.listen(Engine, "before_cursor_execute", _on_cursor_execute)
+            event.listen(Session, "do_orm_execute", _on_orm_execute)
+            _installed = True
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """Collect the statements run inside the block into a QueryLog."""
+    _install()
+    log = QueryLog()
+    token = _active_log.set(log)
+    try:
+        yield log
+    finally:
+        _active_log.reset(token)
+
+
+@contextmanager
+def assert_max_queries(budget: int, label: str = "block") -> Iterator[QueryLog]:
+    """Raise QueryBudgetExceeded if the block runs more than `budget` statements."""
+    with count_queries() as log:
+        yield log
+    log.assert_within(budget, label)
+
+
+def query_budget(max_statements: int):
+    """Declare the most SQL statements one call of an endpoint may run.
+
+    Only records the number on the function (no runtime cost); it is enforced by the
+    query budget check, which calls each route with the identity and category caches cold.
+    """
+    def decorate(endpoint):
+        endpoint.__query_budget__ = max_statements
+        return endpoint
+    return decorate
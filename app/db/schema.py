@@ -0,0 +1,111 @@
+"""Check at startup that the database schema is the one this build's migrations produce.
+
+Tables are owned by Alembic (`migrations/`), so startup does not create them. Instead it
+compares `alembic_version` with the migration head(s) it was built against, in a single
+query, and keeps the answer for the life of the process.
+"""
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import ProgrammingError
+from app.db.database import Base, get_async_engine, get_engine
+
+logger = logging.getLogger(__name__)
+
+# Written at image build time by `python -m app.cli write-schema-head`; the image does not
+# ship the migrations. In a checkout without it, the heads are read from MIGRATIONS_DIR.
+HEAD_FILE = Path(__file__).with_name("schema_head.txt")
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+
+class SchemaMismatchError(RuntimeError):
+    """The database is not at the migration head this build expects."""
+
+
+class SchemaStatus(NamedTuple):
+    expected: frozenset[str]
+    current: frozenset[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.current == self.expected
+
+    def describe(self) -> str:
+        expected = ", ".join(sorted(self.expected))
+        if self.ok:
+            return f"Database schema is at {expected}"
+        if not self.current:
+            return f"Database has no alembic_version; this build expects {expected}. Run `alembic upgrade head`."
+        return (
+            f"Database schema is at {', '.join(sorted(self.current))} but this build expects {expected}. "
+            "Run `alembic upgrade head`, or deploy the build that matches the database."
+        )
+
+
+def migration_heads(migrations_dir: Path = MIGRATIONS_DIR) -> frozenset[str]:
+    """Head revision(s) of an Alembic migrations directory."""
+    from alembic.script import ScriptDirectory
+
+    return frozenset(ScriptDirectory(str(migrations_dir)).get_heads())
+
+
+def write_head_file(migrations_dir: Path = MIGRATIONS_DIR, path: Path = HEAD_FILE) -> frozenset[str]:
+    heads = migration_heads(migrations_dir)
+    path.write_text("\n".join(sorted(heads)) + "\n")
+    return heads
+
+
+@lru_cache
+def expected_heads() -> frozenset[str]:
+    if HEAD_FILE.exists():
+        return frozenset(HEAD_FILE.read_text().split())
+    return migration_heads()
+
+
+_status: Optional[SchemaStatus] = None
+
+
+async def check_schema(engine=None) -> SchemaStatus:
+    """Compare alembic_version with the expected heads. Queries once per process, then returns the cached status."""
+    global _status
+    if _status is None:
+        expected = expected_heads()
+        engine = engine or get_async_engine()
+        # Autocommit: a lone SELECT needs no BEGIN/ROLLBACK round trips around it
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+                current = frozenset(result.scalars())
+            except ProgrammingError:
+                current = frozenset()  # No alembic_version table: migrations have never run
+        _status = SchemaStatus(expected, current)
+    return _status
+
+
+def create_schema(engine=None) -> frozenset[str]:
+    """Create all tables on an empty database and stamp it at the expected head.
+
+    The migration history starts from tables that already existed, so a new database is
+    built from the models instead; later migrations apply on top of it as usual.
+    """
+    from app.db import models  # noqa: F401 (registers the tables on Base.metadata)
+
+    heads = expected_heads()
+    with (engine or get_engine()).begin() as connection:
+        if inspect(connection).has_table("alembic_version"):
+            raise RuntimeError("Database is already managed by Alembic; run `alembic upgrade head` instead.")
+        Base.metadata.create_all(connection)
+        connection.execute(text(
+            "CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL, "
+            "CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))"
+        ))
+        connection.execute(text("INSERT INTO alembic_version (version_num) VALUES (:head)"), [{"head": head} for head in heads])
+    return heads
+
+
+def get_schema_status() -> Optional[SchemaStatus]:
+    """The cached result of check_schema, or None if it has not run."""
+    return _status
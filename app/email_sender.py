@@ -1,5 +1,8 @@
 import os
+import threading
+from typing import NamedTuple, Optional
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,40 +16,117 @@ FROM_NAME = os.getenv("FROM_NAME", "Cloudnotes Notifications")
 # Brevo API endpoint for sending transactional emails
 API_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
 
-# Function to send an email using Brevo's API
-def send_email(to_email: str, subject: str, body: str):
-    """Send an email using Brevo's API"""
-    
-    # Prepare the payload for the email
-    payload = {
-        "sender": {
-            "email": FROM_EMAIL,
-            "name": FROM_NAME
-        },
-        "to": [{"email": to_email}],
-        "subject": subject,
-        "htmlContent": body
-    }
-    
-    # Set headers including the API key for authorization
-    headers = {
-        "api-key": API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    try:
-        # Make the API request to send the email
-        response = requests.post(API_URL, json=payload, headers=headers)
-
-        # Check the response from the API
-        if response.status_code == 200:
-            # If the response contains messageId, treat it as a success
-            if "messageId" in response.json():
-                print(f"Email successfully sent to {to_email} with message ID: {response.json()['messageId']}")
-            else:
-                print(f"Failed to send email. No message ID found in the response.")
+# Brevo accepts up to 1000 message versions in one request
+MAX_BATCH_SIZE = 1000
+
+
+class EmailMessage(NamedTuple):
+    to_email: str
+    subject: str
+    html_content: str
+
+
+class EmailDeliveryError(Exception):
+    """Brevo did not accept a request.
+
+    `retryable` is True for network errors, 429 and 5xx responses, where the same request
+    may succeed later; `retry_after` carries the server's Retry-After hint in seconds.
+    """
+
+    def __init__(self, message: str, retryable: bool, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class BrevoClient:
+    """Brevo transactional email client over a pooled keep-alive connection.
+
+    One client is meant to be reused for many requests, so the TLS handshake to Brevo
+    happens once per pooled connection instead of once per email.
+    """
+
+    def __init__(self, api_url: Optional[str] = None, api_key: Optional[str] = None, timeout: float = 10, pool_size: int = 4):
+        self.api_url = api_url or API_URL
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Retries are decided by the caller (the outbox reschedules), not hidden in the adapter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "api-key": api_key or API_KEY or "",
+            "Accept": "application/json",
+        })
+
+    def _payload(self, messages: list[EmailMessage]) -> dict:
+        first = messages[0]
+        payload = {
+            "sender": {"email": FROM_EMAIL, "name": FROM_NAME},
+            "subject": first.subject,
+            "htmlContent": first.html_content,
+        }
+        if len(messages) == 1:
+            payload["to"] = [{"email": first.to_email}]
         else:
-            print(f"Failed to send email: {response.text}")
-    
-    except Exception as e:
-        print(f"An error occurred: {e}")
+            # One request, one version per recipient, each with its own subject and body
+            payload["messageVersions"] = [
+                {"to": [{"email": message.to_email}], "subject": message.subject, "htmlContent": message.html_content}
+                for message in messages
+            ]
+        return payload
+
+    def send(self, messages: list[EmailMessage]) -> list[Optional[str]]:
+        """Send up to MAX_BATCH_SIZE messages in one request. Returns Brevo message ids in order."""
+        if not messages:
+            return []
+        if len(messages) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} messages per request")
+
+        try:
+            response = self.session.post(self.api_url, json=self._payload(messages), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise EmailDeliveryError(f"Request to Brevo failed: {e}", retryable=True) from e
+
+        if response.status_code >= 300:
+            retry_after = response.headers.get("Retry-After")
+            raise EmailDeliveryError(
+                f"Brevo returned {response.status_code}: {response.text[:500]}",
+                retryable=response.status_code == 429 or response.status_code >= 500,
+                status_code=response.status_code,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        message_ids = body.get("messageIds") or [body.get("messageId")]
+        return list(message_ids) + [None] * (len(messages) - len(message_ids))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_client: Optional[BrevoClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_email_client() -> BrevoClient:
+    """Process-wide client, created on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = BrevoClient()
+        return _default_client
+
+
+# Function to send an email using Brevo's API
+def send_email(to_email: str, subject: str, body: str) -> Optional[str]:
+    """Send one email right away and return its Brevo message id; raises EmailDeliveryError.
+
+    Application code should enqueue emails with app.services.email_outbox instead, so they
+    are retried until delivered.
+    """
+    return get_email_client().send([EmailMessage(to_email, subject, body)])[0]
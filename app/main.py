@@ -1,9 +1,13 @@
-from fastapi import Depends, FastAPI, Response
-from fastapi.responses import JSONResponse
-from app.routes import auth, note
-from app.core.config import get_config, init_cors, init_db
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.routes import attachment, auth, note
+from app.core.config import get_config, init_cors
+from app.core.metrics import METRICS_PROMETHEUS, MetricsMiddleware, registry
+from app.db.schema import SchemaMismatchError, check_schema
 from app.security import get_current_user
+from app.services.password_hasher import password_hasher
 from mangum import Mangum
+import hmac
 import traceback
 import logging
 
@@ -30,6 +34,8 @@ app = FastAPI(
 )
 # Initialize CORS
 init_cors(app)
+# Request metrics; added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware)
 # ✅ Manually handle OPTIONS
 from fastapi.responses import JSONResponse
 
@@ -38,22 +44,51 @@ async def preflight_response():
     response = JSONResponse(content={"message": "CORS preflight successful"}, status_code=204)
     response.headers["Access-Control-Allow-Origin"] = "https://platform.cloudnotes.click"
     response.headers["Access-Control-Allow-Methods"] = "OPTIONS, GET, POST, PUT, DELETE"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, If-None-Match"
     response.headers["Access-Control-Allow-Credentials"] = "true"
     return response
 
 
-# Initialize DB connection
+# Check the database schema version (tables are managed by Alembic, not created here)
 @app.on_event("startup")
 async def startup_event():
+    mode = get_config().SCHEMA_CHECK
+    if mode == "off":
+        return
     try:
-        logger.info("Starting DB initialization...")
-        init_db()
-        logger.info("DB initialization completed successfully")
-        
+        status = await check_schema()
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
+        if mode == "strict":
+            raise
+        return
+
+    if status.ok:
+        logger.info(status.describe())
+    elif mode == "strict":
+        raise SchemaMismatchError(status.describe())
+    else:
+        logger.error(status.describe())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    password_hasher.shutdown()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Request metrics of this process in Prometheus text format (METRICS_MODE=prometheus).
+
+    Only served with METRICS_TOKEN set, to scrapers sending it as a bearer token: per-route
+    traffic and latency are not for the public.
+    """
+    config = get_config()
+    if config.METRICS_MODE != METRICS_PROMETHEUS or not config.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {config.METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
@@ -67,6 +102,7 @@ def secure_endpoint(user=Depends(get_current_user)):
 # Include Routes
 app.include_router(auth.router)
 app.include_router(note.router)
+app.include_router(attachment.router)
 
 
 # Create the Mangum handler
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_async_db
+from app.db.query_counter import query_budget
+from app.schemas.notes import AttachmentCompleteRequest, AttachmentDownloadResponse, AttachmentUploadRequest
+from app.schemas.response import StandardResponse
+from app.schemas.users import UserResponse
+from app.security import get_current_user
+from app.services.attachment_uploads import complete_upload, create_upload, download_url
+
+router = APIRouter(prefix="/v1/notes", tags=["Attachments"])
+
+
+@router.post("/{note_id}/attachments", response_model=StandardResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(3)
+async def start_attachment_upload(
+    note_id: str,
+    request: AttachmentUploadRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Start an upload: returns presigned URL(s) to PUT the file to, straight to storage.
+
+    The attachment stays hidden until POST .../{attachment_id}/complete confirms the file arrived.
+    """
+    upload = await create_upload(db, user.id, note_id, request)
+    return StandardResponse(
+        isSuccess=True,
+        messages=["Upload started"],
+        errors=[],
+        data=upload,
+        status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.post("/{note_id}/attachments/{attachment_id}/complete", response_model=StandardResponse)
+@query_budget(5)
+async def complete_attachment_upload(
+    note_id: str,
+    attachment_id: str,
+    request: AttachmentCompleteRequest = AttachmentCompleteRequest(),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Confirm the upload (a HEAD request on the stored object) and attach the file to the note.
+
+    For a multipart upload, send the ETag of every part.
+    """
+    attachment = await complete_upload(db, user.id, note_id, attachment_id, request.parts)
+    return StandardResponse(
+        isSuccess=True,
+        messages=["Attachment uploaded"],
+        errors=[],
+        data=attachment,
+        status_code=status.HTTP_200_OK
+    )
+
+
+@router.get("/{note_id}/attachments/{attachment_id}", response_model=StandardResponse)
+@query_budget(2)
+async def get_attachment_download_url(
+    note_id: str,
+    attachment_id: str,
+    thumbnail: bool = Query(False, description="Download the JPEG thumbnail made for an image instead"),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """A short-lived URL to download the file (or its thumbnail) from storage directly."""
+    url, expires_in = await download_url(db, user.id, note_id, attachment_id, thumbnail=thumbnail)
+    return StandardResponse(
+        isSuccess=True,
+        messages=["Download URL created"],
+        errors=[],
+        data=AttachmentDownloadResponse(url=url, expires_in=expires_in),
+        status_code=status.HTTP_200_OK
+    )
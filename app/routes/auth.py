@@ -4,19 +4,23 @@ import logging
 from fastapi.security import OAuth2PasswordRequestForm
 import ulid
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, BackgroundTasks, FastAPI, HTTPException, Depends, status, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Request, status, Body
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, EmailStr
 from passlib.context import CryptContext
 from jose import jwt
-from app.core.config import get_config, init_cors, init_db
-from app.db.database import get_db
+from app.core.config import get_config
+from app.db.database import get_async_db
+from app.db.query_counter import query_budget
 from app.db.models import User
-from app.email_sender import send_email
 from app.schemas.auth import LoginResponse
 from app.schemas.response import StandardResponse
 from app.schemas.users import UserCreate
+from app.services.email_outbox import enqueue_email
+from app.services.password_hasher import password_hasher
+from app.services.rate_limiter import rate_limiter
 from app.security import (
     create_access_token,
     create_refresh_token,
@@ -24,10 +28,9 @@ from app.security import (
     is_password_secure,
     create_reset_token,
     verify_reset_token,
+    invalidate_cached_user,
 )
 
-# Logging configuration
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Load configuration settings
@@ -37,7 +40,6 @@ class ResetPasswordRequest(BaseModel):
     email: EmailStr
     
 router = APIRouter(prefix="/v1/auth", tags=["Authentication"])
-pwd_context = config.PWD_CONTEXT
 
 
 
@@ -47,15 +49,18 @@ def create_confirmation_token(email: str):
     return jwt.encode({"sub": email, "exp": expire}, config.SECRET_KEY, algorithm=config.ALGORITHM)
 
 @router.post("/register", response_model=StandardResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user: UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+@query_budget(4)
+async def register_user(user: UserCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Registers a new user and sends an email confirmation"""
+    await rate_limiter.check(request, "register", user.email)
     if not is_password_secure(user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must be at least 8 characters long, contain at least one uppercase letter, one lowercase letter, one number, and one special character."
         )
 
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User.id).where(User.email == user.email))
+    existing_user = result.first()
     if existing_user:
         return StandardResponse(
                 isSuccess=False,
@@ -65,7 +70,7 @@ def register_user(user: UserCreate, background_tasks: BackgroundTasks, db: Sessi
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     new_user = User(
         user_ulid = ulid.new().str,
         first_name=user.first_name,
@@ -74,16 +79,6 @@ def register_user(user: UserCreate, background_tasks: BackgroundTasks, db: Sessi
         password_hash=hashed_password,
         is_active=False
     )
-    try:
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-    
-   
-    except IntegrityError:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error while registering user")
-
     # Generate confirmation token
     expire = datetime.now(timezone.utc) + timedelta(hours=1)
     token = jwt.encode({"sub": new_user.email, "exp": expire}, config.SECRET_KEY, algorithm=config.ALGORITHM)
@@ -92,15 +87,24 @@ def register_user(user: UserCreate, background_tasks: BackgroundTasks, db: Sessi
     BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
     confirm_url = f"{BASE_URL}/v1/auth/confirm-email?token={token}"
 
-    # Send confirmation email
-        # Send confirmation email in the background
-    background_tasks.add_task(
-        send_email,
+    # Confirmation email is queued in the same transaction as the user; the outbox worker sends it
+    enqueue_email(
+        db,
         to_email=new_user.email,
         subject="Confirm Your Email",
-        body=f"Click the link to confirm your email: {confirm_url}"
+        html_content=f"Click the link to confirm your email: {confirm_url}"
     )
 
+    try:
+        db.add(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+    
+   
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error while registering user")
+
     return StandardResponse(
             isSuccess=True,
             messages=["User registered successfully"],
@@ -110,15 +114,19 @@ def register_user(user: UserCreate, background_tasks: BackgroundTasks, db: Sessi
         )
 
 @router.post("/login", response_model=LoginResponse, status_code=status.HTTP_200_OK)
-def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@query_budget(1)
+async def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Handles user login and returns a JWT token"""
+    # Before the user lookup and the bcrypt verify: that is the work a burst of guesses costs
+    await rate_limiter.check(request, "login", form_data.username)
 
-    user = db.query(User).filter(User.email == form_data.username).first()
+    result = await db.execute(select(User).where(User.email == form_data.username))
+    user = result.scalars().first()
     if not user:
         logger.warning(f"User not found: {form_data.username}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    is_password_correct = pwd_context.verify(form_data.password, user.password_hash)
+    is_password_correct = await password_hasher.verify(form_data.password, user.password_hash)
     logger.debug(f"Password verification result: {is_password_correct}")
 
     if not user.is_active:
@@ -153,17 +161,20 @@ def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = D
 
 
 @router.get("/test-db")
-def test_db_connection(db: Session = Depends(get_db)):
+@query_budget(0)
+async def test_db_connection(db: AsyncSession = Depends(get_async_db)):
     return {"message": "Database connection is working!"}
 
 @router.get("/confirm-email")
-def confirm_email(token: str, db: Session = Depends(get_db)):
+@query_budget(2)
+async def confirm_email(token: str, db: AsyncSession = Depends(get_async_db)):
     """Verifies email confirmation token and activates the user"""
     email = verify_confirmation_token(token)
     if not email:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -171,15 +182,19 @@ def confirm_email(token: str, db: Session = Depends(get_db)):
         return StandardResponse(isSuccess=True,errors=[], messages=["Account already confirmed"],status_code=status.HTTP_200_OK)
 
     user.is_active = True  # Activate the user
-    db.commit()
+    await db.commit()
+    invalidate_cached_user(user.email)
 
     return StandardResponse(isSuccess=True,errors=[], messages=["Email confirmed successfully! You can now log in."], status_code=status.HTTP_200_OK)
 
 
 @router.post("/reset-password/request", response_model=StandardResponse)
-def request_password_reset( request: ResetPasswordRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+@query_budget(2)
+async def request_password_reset( request: ResetPasswordRequest, http_request: Request, db: AsyncSession = Depends(get_async_db)):
     """Generate a password reset token and send it to the user's email"""
-    user = db.query(User).filter(User.email == request.email).first()
+    await rate_limiter.check(http_request, "reset_password", request.email)
+    result = await db.execute(select(User).where(User.email == request.email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="Email not registered")
     if not user.is_active:
@@ -191,7 +206,7 @@ def request_password_reset( request: ResetPasswordRequest, background_tasks: Bac
     BASE_URL = os.getenv("FRONTEND_URL", "http://localhost:4200")
     reset_url = f"{BASE_URL}/reset-password?token={reset_token}"
 
-    # Send email in the background (non-blocking)
+    # Queued for the outbox worker (non-blocking, retried until delivered)
     email_body = f"""
     Hello {user.first_name},
 
@@ -201,12 +216,13 @@ def request_password_reset( request: ResetPasswordRequest, background_tasks: Bac
 
     If you did not request this, please ignore this email.
     """
-    background_tasks.add_task(
-        send_email,
+    enqueue_email(
+        db,
         to_email=user.email,
         subject="Reset Your Password",
-        body=email_body
+        html_content=email_body
     )
+    await db.commit()
     return StandardResponse(
         isSuccess=True,
         messages=["Password reset link sent to your email"],
@@ -216,26 +232,29 @@ def request_password_reset( request: ResetPasswordRequest, background_tasks: Bac
     )
 
 @router.post("/reset-password", response_model=StandardResponse)
-def reset_password(
+@query_budget(2)
+async def reset_password(
     token: str = Body(...),
     new_password: str = Body(..., min_length=6),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Verify the reset token and update the user's password"""
     email = verify_reset_token(token)
     if not email:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if not is_password_secure(new_password):
         raise HTTPException(status_code=400, detail="Password must contain uppercase, lowercase, number, and special character")
     # Hash the new password
-    hashed_password = pwd_context.hash(new_password)
+    hashed_password = await password_hasher.hash(new_password)
     user.password_hash = hashed_password
-    db.commit()
+    await db.commit()
+    invalidate_cached_user(user.email)
 
     return StandardResponse(
         isSuccess=True,
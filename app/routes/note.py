@@ -1,49 +1,103 @@
 from collections import defaultdict
 import datetime
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query, logger, status
-from sqlalchemy import extract, func, or_
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, logger, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+from sqlalchemy import Integer, String, Text, column, func, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from typing import Optional
-from datetime import datetime
+from datetime import date as date_type, datetime, time, timedelta
 
 import ulid
-from app.db.database import get_db
-from app.db.models import Category, Color, Note, User
-from app.schemas.notes import CategoryResponse, NoteCreate, NoteResponse, NotesRequest
+from app.core.config import get_config
+from app.core.http_cache import etag_matches, make_etag, not_modified, set_validators
+from app.db.database import get_async_db
+from app.db.query_counter import query_budget
+from app.db.models import Attachment, Category, Color, ImportJob, Note, NoteDailyCount, User
+from app.schemas.notes import (
+    CategoryResponse,
+    ImportJobResponse,
+    NoteBulkUpsertRequest,
+    NoteCreate,
+    NoteReorderRequest,
+    NoteResponse,
+    NoteStateResponse,
+    NotesRequest,
+)
 from app.schemas.response import StandardResponse
 from app.schemas.users import UserResponse
 from app.security import get_current_user
+from app.services.attachment_uploads import ATTACHMENT_UPLOADED
+from app.services.categories import DEFAULT_CATEGORY_NAME, resolve_category_ids
+from app.services.note_counts import UNCATEGORIZED_KEY, NoteCountDeltas
+from app.services.note_export import EXPORT_FORMATS, count_export_rows, stream_export
+from app.services.note_import import claim_import_job, create_import_job, run_import
+from app.services.note_ordering import ORDER_GAP, last_order_indexes, next_order_index, plan_reorder
+from app.services.note_search import decode_cursor, search_notes
+from app.services.note_trash import LIVE_NOTE, archive_note, move_to_trash, restore_from_trash, unarchive_note
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 router = APIRouter(prefix="/v1/notes", tags=["Notes"])
-DEFAULT_CATEGORY_NAME = "Uncategorized"
-DEFAULT_CATEGORY_COLOR = "#FFFFFF"
+
+# Relationships rendered by NoteResponse; async sessions cannot lazy load them later.
+# The many-to-one ones are joined into the note's own query, only attachments need a second
+# (uploads that were never confirmed are left out)
+NOTE_RESPONSE_OPTIONS = (
+    joinedload(Note.user),
+    joinedload(Note.category).joinedload(Category.color),
+    selectinload(Note.attachments.and_(Attachment.status == ATTACHMENT_UPLOADED)),
+)
+
+
+def _day_range(day: date_type) -> tuple[datetime, datetime]:
+    """Half-open [start, end) bounds of a day, so filters on Note.date can use an index."""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _month_range(year: int, month: int) -> tuple[datetime, datetime]:
+    """Half-open [start, end) bounds of a calendar month."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+async def _get_note_for_response(db: AsyncSession, note_id: str) -> Optional[Note]:
+    """Load a note together with everything NoteResponse needs."""
+    result = await db.execute(
+        select(Note)
+        .where(Note.id == note_id)
+        .options(*NOTE_RESPONSE_OPTIONS)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
 
 
 @router.post("/create-or-update-note", response_model=StandardResponse, status_code=status.HTTP_201_CREATED)
-def create_or_update_note(
+@query_budget(6)
+async def create_or_update_note(
     note: NoteCreate, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), 
+    user: UserResponse = Depends(get_current_user)
 ):
     existing_note = None
     if note.note_id:
-        existing_note = db.query(Note).filter(
-            Note.id == note.note_id, Note.user_id == user.id
-        ).first()
+        result = await db.execute(
+            select(Note).where(Note.id == note.note_id, Note.user_id == user.id)
+        )
+        existing_note = result.scalars().first()
 
     if existing_note:
         # 🔹 **Update only title & content, ignore date**
         existing_note.title = note.title
         existing_note.content = note.content
 
-        db.commit()
-        db.refresh(existing_note)
+        await db.commit()
+        existing_note = await _get_note_for_response(db, existing_note.id)
 
         return StandardResponse(
             isSuccess=True,
@@ -60,92 +114,27 @@ def create_or_update_note(
             detail="A date must be provided for new notes."
         )
 
-    category = None
-    if note.category_name:
-        category = db.query(Category).filter(
-            Category.name == note.category_name,
-            Category.user_id == user.id
-        ).first()
-
-        if not category:
-            unused_color = db.query(Color).filter(
-                Color.user_id == user.id, Color.is_assigned == False
-            ).first()
-            category = Category(
-                id=ulid.new().str,
-                user_id=user.id,
-                name=note.category_name,
-                color=unused_color.color if unused_color else DEFAULT_CATEGORY_COLOR
-            )
-            db.add(category)
-            if unused_color:
-                unused_color.is_assigned = True
-                
-            db.commit()
-            db.refresh(category)
-            
-            if not unused_color:
-                unused_color = db.query(Color).filter(Color.user_id == user.id).order_by(func.random()).first()
-
-              
-            if not unused_color:
-                unused_color = db.query(Color).order_by(func.random()).first()
-
-            category = Category(
-                id=ulid.new().str,
-                user_id=user.id,
-                name=note.category_name,
-                color_id=unused_color.id if unused_color else None
-            )
-            db.add(category)
-            db.commit()
-            db.refresh(category)
-
-    if not category:
-          category = db.query(Category).filter(
-            Category.name == DEFAULT_CATEGORY_NAME, Category.user_id == user.id
-        ).first()
-    # ✅ **Apply default category if none provided**
-    if not category:
-        category = db.query(Category).filter(
-            Category.name == DEFAULT_CATEGORY_NAME, 
-            Category.user_id == user.id
-        ).first()
-    if not category:
-        default_color = db.query(Color).order_by(func.random()).first()
-        
-        category = Category(
-            id=ulid.new().str,
-            user_id=user.id,
-            name=DEFAULT_CATEGORY_NAME,
-            color_id=default_color.id if default_color else None
-        )
-        db.add(category)
-        db.commit()
-        db.refresh(category)
-
-    category_id = category.id
+    # 🔹 **Resolve (or create) the category, default when none provided**
+    category_name = note.category_name or DEFAULT_CATEGORY_NAME
+    category_ids = await resolve_category_ids(db, user.id, [category_name])
+    category_id = category_ids[category_name]
 
-    # 🔹 **Find max `order_index` for this date**
-    max_order_index = db.query(Note.order_index)\
-        .filter(Note.user_id == user.id, Note.date == note.date)\
-        .order_by(Note.order_index.desc())\
-        .first()
-
-    new_order_index = (max_order_index[0] + 1) if max_order_index else 0
-
-    # 🔹 **Create a new note**
+    # 🔹 **Create a new note at the end of its day (index computed inside the INSERT)**
+    day_start, day_end = _day_range(note.date.date())
     new_note = Note(
         title=note.title,
         content=note.content,
         user_id=user.id,
         date=note.date,
         category_id=category_id,
-        order_index=new_order_index
+        order_index=next_order_index(user.id, day_start, day_end)
     )
     db.add(new_note)
-    db.commit()
-    db.refresh(new_note)
+    count_deltas = NoteCountDeltas(user.id)
+    count_deltas.add(new_note.date, category_id)
+    await count_deltas.apply(db)
+    await db.commit()
+    new_note = await _get_note_for_response(db, new_note.id)
 
     return StandardResponse(
         isSuccess=True,
@@ -155,127 +144,360 @@ def create_or_update_note(
         status_code=status.HTTP_201_CREATED
     )
 
-@router.get("/get-all-notes", response_model=StandardResponse)
-def get_notes(
+@router.post("/bulk-upsert", response_model=StandardResponse)
+@query_budget(5)
+async def bulk_upsert_notes(
+    request: NoteBulkUpsertRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Create or update many notes in one transaction (offline sync).
+
+    Follows create-or-update-note per note: a note_id owned by the user updates title
+    and content, anything else creates a new note on its date.
+    """
+    # 🔹 **Which note_ids already exist for this user**
+    note_ids = {note.note_id for note in request.notes if note.note_id}
+    existing_ids = set()
+    if note_ids:
+        result = await db.execute(select(Note.id).where(Note.id.in_(note_ids), Note.user_id == user.id))
+        existing_ids = set(result.scalars().all())
+
+    updates = {}
+    new_notes = []
+    results = []
+    for note in request.notes:
+        if note.note_id in existing_ids:
+            updates[note.note_id] = note  # Last write wins for repeated ids
+            results.append({"id": note.note_id, "action": "updated"})
+        else:
+            new_notes.append(note)
+            results.append(None)
+
+    if new_notes:
+        # 🔹 **Resolve every category name at once**
+        category_ids = await resolve_category_ids(
+            db, user.id, {note.category_name or DEFAULT_CATEGORY_NAME for note in new_notes}
+        )
+
+        # 🔹 **Current max `order_index` for every day in the batch**
+        last_order_index = await last_order_indexes(db, user.id, (note.date.date() for note in new_notes))
+
+        count_deltas = NoteCountDeltas(user.id)
+        rows = []
+        for note in new_notes:
+            day = note.date.date()
+            order_index = last_order_index.get(day, 0) + ORDER_GAP
+            last_order_index[day] = order_index
+            category_id = category_ids[note.category_name or DEFAULT_CATEGORY_NAME]
+            rows.append({
+                "id": ulid.new().str,
+                "title": note.title,
+                "content": note.content,
+                "user_id": user.id,
+                "date": note.date,
+                "category_id": category_id,
+                "order_index": order_index,
+            })
+            count_deltas.add(note.date, category_id)
+
+        await db.execute(insert(Note), rows)
+        await count_deltas.apply(db)
+
+        created_ids = iter(row["id"] for row in rows)
+        results = [result or {"id": next(created_ids), "action": "created"} for result in results]
+
+    if updates:
+        # 🔹 **One UPDATE ... FROM (VALUES ...) for all edited notes**
+        changes = values(
+            column("id", String), column("title", String), column("content", Text), name="changes"
+        ).data([(note_id, note.title, note.content) for note_id, note in updates.items()])
+        await db.execute(
+            update(Note)
+            .where(Note.id == changes.c.id, Note.user_id == user.id)
+            .values(title=changes.c.title, content=changes.c.content, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    await db.commit()
+
+    return StandardResponse(
+        isSuccess=True,
+        messages=[f"{len(new_notes)} notes created, {len(updates)} notes updated"],
+        errors=[],
+        data=results,
+        status_code=status.HTTP_200_OK
+    )
+
+@router.put("/reorder", response_model=StandardResponse)
+@query_budget(3)
+async def reorder_notes(
+    request: NoteReorderRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Apply a new ordering to the notes of one day; note_ids must list every note of the day.
+
+    Only notes that are out of place get a new order_index; they are written with a
+    single UPDATE ... FROM (VALUES ...).
+    """
+    if len(set(request.note_ids)) != len(request.note_ids):
+        raise HTTPException(status_code=400, detail="note_ids must not contain duplicates.")
+
+    day_start, day_end = _day_range(request.date)
+    result = await db.execute(
+        select(Note.id, Note.order_index)
+        .where(Note.user_id == user.id, Note.date >= day_start, Note.date < day_end, LIVE_NOTE)
+    )
+    current = dict(result.all())
+    unknown = [note_id for note_id in request.note_ids if note_id not in current]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Notes not found for this date: {', '.join(unknown)}")
+    # A partial list has no defined place for the notes it leaves out
+    missing = current.keys() - set(request.note_ids)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"note_ids must include every note of the day, missing: {', '.join(sorted(missing))}")
+
+    changes = plan_reorder(request.note_ids, current)
+    if changes:
+        new_order = values(
+            column("id", String), column("order_index", Integer), name="new_order"
+        ).data(list(changes.items()))
+        await db.execute(
+            update(Note)
+            .where(Note.id == new_order.c.id, Note.user_id == user.id)
+            .values(order_index=new_order.c.order_index, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    return StandardResponse(
+        isSuccess=True,
+        messages=["Notes reordered successfully"],
+        errors=[],
+        data={"updated": len(changes)},
+        status_code=status.HTTP_200_OK
+    )
+
+async def _note_state_response(state: Optional[dict], db: AsyncSession, message: str) -> StandardResponse:
+    if state is None:
+        raise HTTPException(status_code=404, detail="Note not found.")
+    await db.commit()
+    return StandardResponse(
+        isSuccess=True,
+        messages=[message],
+        errors=[],
+        data=NoteStateResponse.model_validate(state),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.delete("/{note_id}", response_model=StandardResponse)
+@query_budget(3)
+async def delete_note(
+    note_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Move a note to the trash. It can be restored until purge-trash removes it
+    (TRASH_RETENTION_DAYS after deletion). Deleting a trashed note changes nothing."""
+    state = await move_to_trash(db, user.id, note_id)
+    return await _note_state_response(state, db, "Note moved to trash")
+
+@router.post("/{note_id}/restore", response_model=StandardResponse)
+@query_budget(3)
+async def restore_note(
+    note_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Take a note out of the trash; an archived note goes back to the archive."""
+    state = await restore_from_trash(db, user.id, note_id)
+    return await _note_state_response(state, db, "Note restored")
+
+@router.post("/{note_id}/archive", response_model=StandardResponse)
+@query_budget(3)
+async def archive(
+    note_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Hide a note from the day lists, counts, search and export without deleting it."""
+    state = await archive_note(db, user.id, note_id)
+    if state is not None and state["is_deleted"]:
+        raise HTTPException(status_code=409, detail="Restore the note from the trash before archiving it.")
+    return await _note_state_response(state, db, "Note archived")
+
+@router.post("/{note_id}/unarchive", response_model=StandardResponse)
+@query_budget(3)
+async def unarchive(
+    note_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    state = await unarchive_note(db, user.id, note_id)
+    if state is not None and state["is_deleted"]:
+        raise HTTPException(status_code=409, detail="Restore the note from the trash before unarchiving it.")
+    return await _note_state_response(state, db, "Note unarchived")
+
+@router.get("/get-all-notes", response_model=StandardResponse, response_class=ORJSONResponse)
+@query_budget(4)
+async def get_notes(
+    request: Request,
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
 ):
+    """Notes of one day as plain rows; the user is sent once in `data.user`, not per note.
+
+    Supports If-None-Match: the ETag is derived from the day's note count and latest
+    updated_at (every write, reorder, move and completed upload bumps one or the other),
+    so an unchanged day is answered with 304 after a single index-only aggregate.
+    """
     try:
-        logger.info(f"Received request for note count on date: {date}")
         selected_date = datetime.strptime(date, "%Y-%m-%d").date()
-        logger.info(f"Parsed selected date: {selected_date}")
-
-        # Extract month and year for debugging
-        month, year = selected_date.month, selected_date.year
-        logger.info(f"Extracted Month: {month}, Year: {year}")
-
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
-    notes = (
-        db.query(Note)
-        .filter(
-            Note.user_id == user.id,
-            func.date(Note.date) == selected_date  # This ensures it ignores time
-        )
-        .options(
-            joinedload(Note.user),
-            joinedload(Note.category),
-            joinedload(Note.attachments)
+    day_start, day_end = _day_range(selected_date)
+    day_filter = (
+        Note.user_id == user.id,
+        Note.date >= day_start,  # Any time on the selected day
+        Note.date < day_end,
+        LIVE_NOTE,  # Trashed and archived notes are not listed
+    )
+    result = await db.execute(select(func.count(), func.max(Note.updated_at)).where(*day_filter))
+    note_count, last_modified = result.one()
+    etag = make_etag("notes", selected_date, note_count, last_modified, user.model_dump_json())
+    if etag_matches(request, etag):
+        return not_modified(etag, last_modified)
+
+    # Only the columns the client renders, no ORM objects
+    result = await db.execute(
+        select(
+            Note.id,
+            Note.title,
+            Note.content,
+            Note.date,
+            Note.pinned,
+            Note.order_index,
+            Note.is_deleted,
+            Note.deleted_at,
+            Note.is_archived,
+            Note.created_at,
+            Note.updated_at,
+            Category.id.label("category_id"),
+            Category.numeric_id.label("category_numeric_id"),
+            Category.name.label("category_name"),
+            Color.id.label("color_id"),
+            Color.color.label("color"),
         )
-        .all()
+        .outerjoin(Category, Category.id == Note.category_id)
+        .outerjoin(Color, Color.id == Category.color_id)
+        .where(*day_filter)
+        .order_by(Note.order_index, Note.id)
     )
-    
-    logger.info(f"📝 Fetched {len(notes)} notes for date: {selected_date}")
-
-    note_responses = [
-        NoteResponse(
-            id=note.id,
-            title=note.title,
-            content=note.content,
-            date=note.date,
-            pinned=note.pinned,
-            order_index=note.order_index,
-            is_deleted=note.is_deleted,
-            deleted_at=note.deleted_at,
-            is_archived=note.is_archived,
-            created_at=note.created_at,
-            updated_at=note.updated_at,
-            user=UserResponse(
-                id=note.user.id,
-                user_ulid=note.user.user_ulid,
-                first_name=note.user.first_name,
-                last_name=note.user.last_name,
-                email=note.user.email,
-                is_active=note.user.is_active, 
-            ),
-            category=(
-                {"id": note.category.id, 
-                "numeric_id": note.category.numeric_id,
-                "color": note.category.color,
-                "name": note.category.name
-                 }
-                if note.category else None
-            ),
-            attachments=[
-                {"id": att.id, "file_name": att.file_name, "file_url": att.file_url}
-                for att in note.attachments
-            ]
+    rows = result.all()
+
+    attachments_by_note = defaultdict(list)
+    if rows:
+        result = await db.execute(
+            select(Attachment.note_id, Attachment.id, Attachment.file_name, Attachment.file_url)
+            .where(Attachment.note_id.in_([row.id for row in rows]), Attachment.status == ATTACHMENT_UPLOADED)
         )
-        for note in notes   
+        for note_id, attachment_id, file_name, file_url in result.all():
+            attachments_by_note[note_id].append({"id": attachment_id, "file_name": file_name, "file_url": file_url})
+
+    logger.debug("Fetched %s notes for date: %s", len(rows), selected_date)
+
+    notes = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "content": row.content,
+            "date": row.date,
+            "pinned": row.pinned,
+            "order_index": row.order_index,
+            "is_deleted": row.is_deleted,
+            "deleted_at": row.deleted_at,
+            "is_archived": row.is_archived,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "category": (
+                {
+                    "id": row.category_id,
+                    "numeric_id": row.category_numeric_id,
+                    "name": row.category_name,
+                    "color": {"id": row.color_id, "color": row.color} if row.color_id is not None else None,
+                }
+                if row.category_id is not None else None
+            ),
+            "attachments": attachments_by_note.get(row.id, []),
+        }
+        for row in rows
     ]
-    
-    logger.info(f"✅ Returning {len(note_responses)} notes in response.")
-    return StandardResponse(
-        isSuccess=True,
-        messages=["Notes retrieved successfully"] if notes else ["No notes found for the selected date"],
-        data=note_responses,
-        status_code=status.HTTP_200_OK
-    )
+
+    # Returned as-is: skips response_model validation, orjson handles datetimes natively
+    response = ORJSONResponse(content={
+        "isSuccess": True,
+        "messages": ["Notes retrieved successfully"] if notes else ["No notes found for the selected date"],
+        "errors": [],
+        "data": {"user": user.model_dump(), "notes": notes},
+        "status_code": status.HTTP_200_OK,
+    })
+    set_validators(response, etag, last_modified)
+    return response
  
 @router.post("/get-all-notes-count", response_model=StandardResponse)
-def get_notes_count(
+@query_budget(2)
+async def get_notes_count(
     request: NotesRequest,  # Expecting month and year in request body
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
 ):
-    # Fetch note counts grouped by date and category
-    notes_count = (
-        db.query(Note.date, Note.category_id, func.count(Note.id).label("count"))
-        .filter(
-            Note.user_id == user.id,
-            extract('month', Note.date) == request.month,
-            extract('year', Note.date) == request.year
+    try:
+        month_start, month_end = _month_range(request.year, request.month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month or year.")
+
+    # Pre-aggregated counts with category details, one indexed read on note_daily_counts
+    result = await db.execute(
+        select(
+            NoteDailyCount.day,
+            NoteDailyCount.category_id,
+            NoteDailyCount.count,
+            Category.numeric_id,
+            Category.name,
+            Color.color,
+        )
+        .outerjoin(Category, Category.id == NoteDailyCount.category_id)
+        .outerjoin(Color, Color.id == Category.color_id)
+        .where(
+            NoteDailyCount.user_id == user.id,
+            NoteDailyCount.day >= month_start.date(),
+            NoteDailyCount.day < month_end.date(),
+            NoteDailyCount.count > 0
         )
-        .group_by(Note.date, Note.category_id)
-        .all()
     )
-    # Fetch all categories in one go to avoid multiple queries
-    category_ids = {category_id for _, category_id, _ in notes_count if category_id}
-    categories = db.query(Category).filter(Category.id.in_(category_ids)).all()
-    category_map = {cat.id: cat for cat in categories}
+    notes_count = result.all()
 
     # Transform data into a structured format
     counts_by_date = defaultdict(dict)
 
-    for note_date, category_id, count in notes_count:
-        date_str = note_date.strftime("%Y-%m-%d")  # Convert date to string
+    for note_day, category_id, count, numeric_id, category_name, color in notes_count:
+        date_str = note_day.strftime("%Y-%m-%d")  # Convert date to string
         
-        # Get category details
-        category = category_map.get(category_id)
-        category_key = category_id or "uncategorized"
+        # Counts for a deleted category are reported as uncategorized
+        category_key = category_id if category_name is not None else UNCATEGORIZED_KEY
 
         # 🔥 Merge count for the same category on the same day
         if category_key in counts_by_date[date_str]:
             counts_by_date[date_str][category_key]["count"] += count
         else:
             counts_by_date[date_str][category_key] = {
-                "category_id": category_id,
-                "numeric_id": category.numeric_id if category else None,
-                "name": category.name if category else "Uncategorized",
-                # Extract the actual color string from the Color object
-                "color": category.color.color if category and category.color else "#FFFFFF",
+                "category_id": category_id if category_name is not None else None,
+                "numeric_id": numeric_id,
+                "name": category_name if category_name is not None else "Uncategorized",
+                "color": color or "#FFFFFF",
                 "count": count
             }
     # Convert dictionary values into lists
@@ -291,12 +513,154 @@ def get_notes_count(
     )
 
 
+@router.get("/search", response_model=StandardResponse)
+@query_budget(3)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms; supports \"phrases\", OR and -exclusions"),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    results, next_cursor, truncated = await search_notes(db, user.id, q, limit, after)
+
+    return StandardResponse(
+        isSuccess=True,
+        messages=["Notes retrieved successfully"] if results else ["No notes match the search"],
+        # truncated: only the SEARCH_CANDIDATE_LIMIT most recent matches were ranked and paged
+        data={"results": results, "next_cursor": next_cursor, "truncated": truncated},
+        status_code=status.HTTP_200_OK
+    )
+
+
+@router.get("/export")
+@query_budget(2)
+async def export_notes(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    from_date: Optional[date_type] = Query(None, alias="from", description="First day to export (YYYY-MM-DD)"),
+    to_date: Optional[date_type] = Query(None, alias="to", description="Last day to export, inclusive"),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Stream all of the user's notes (or those between `from` and `to`) with category and attachment metadata."""
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    start = _day_range(from_date)[0] if from_date else None
+    end = _day_range(to_date)[1] if to_date else None
+
+    # Where the response is buffered (Mangum), refuse exports that would not fit instead of failing midway
+    max_rows = get_config().EXPORT_MAX_ROWS
+    if max_rows:
+        row_count = await count_export_rows(db, user.id, start, end)
+        if row_count > max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Export of {row_count} notes exceeds the limit of {max_rows}. Use 'from' and 'to' to export a smaller range.",
+            )
+
+    return StreamingResponse(
+        stream_export(user.id, format, start, end, yield_per=get_config().EXPORT_YIELD_PER),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="notes-export.{format}"'},
+    )
+
+
+@router.post("/import", response_model=StandardResponse)
+@query_budget(10)  # An import that fits in one IMPORT_CHUNK_SIZE chunk
+async def import_notes(
+    request: Request,
+    format: str = Query(..., pattern="^(ndjson|csv)$", description="Format of the request body: ndjson or csv"),
+    job_id: Optional[str] = Query(None, description="Resume this import; send the same file again"),
+    filename: Optional[str] = Query(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Import notes from the raw request body (NDJSON, or CSV with a header row).
+
+    Every record is validated like create-or-update-note. Valid ones are loaded in
+    chunks with COPY, and each chunk commits together with the job's checkpoint. If
+    the upload fails, send the same file with `job_id`: records already loaded are
+    skipped.
+    """
+    if job_id:
+        result = await db.execute(select(ImportJob).where(ImportJob.id == job_id, ImportJob.user_id == user.id))
+        job = result.scalars().first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Import job not found.")
+        if job.format != format:
+            raise HTTPException(status_code=400, detail=f"Import job {job_id} expects {job.format}.")
+    else:
+        job = await create_import_job(db, user.id, format, filename)
+
+    if not await claim_import_job(db, job):
+        raise HTTPException(status_code=409, detail=f"Import job {job.id} is {job.status}.")
+
+    try:
+        await run_import(db, job, request.stream())
+    except ClientDisconnect:
+        # Nobody reads this response; the job stays resumable from its checkpoint
+        raise HTTPException(status_code=499, detail=f"Upload interrupted, resend the file with job_id={job.id}.")
+    await db.refresh(job)
+
+    return StandardResponse(
+        isSuccess=True,
+        messages=[f"{job.rows_imported} notes imported, {job.rows_rejected} records rejected"],
+        data=ImportJobResponse.model_validate(job),
+        status_code=status.HTTP_200_OK
+    )
+
+
+@router.get("/import/{job_id}", response_model=StandardResponse)
+@query_budget(2)
+async def get_import_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
+):
+    result = await db.execute(select(ImportJob).where(ImportJob.id == job_id, ImportJob.user_id == user.id))
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found.")
+
+    return StandardResponse(
+        isSuccess=True,
+        messages=["Import job retrieved successfully"],
+        data=ImportJobResponse.model_validate(job),
+        status_code=status.HTTP_200_OK
+    )
+
+
 @router.get("/categories", response_model=StandardResponse)
-def get_categories(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+@query_budget(3)
+async def get_categories(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserResponse = Depends(get_current_user)
 ):
-    categories = db.query(Category).filter(Category.user_id == user.id).all()
+    # Categories are only ever added or deleted, never edited: the count and the highest
+    # serial id change on every such write, so together they version the user's list
+    result = await db.execute(
+        select(func.count(), func.max(Category.numeric_id), func.max(Category.created_at))
+        .where(Category.user_id == user.id)
+    )
+    category_count, max_numeric_id, last_modified = result.one()
+    etag = make_etag("categories", category_count, max_numeric_id)
+    if etag_matches(request, etag):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+
+    result = await db.execute(
+        select(Category).where(Category.user_id == user.id).options(joinedload(Category.color))
+    )
+    categories = result.scalars().all()
     
     category_responses = [
         CategoryResponse(
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from datetime import date, datetime, timezone
 from typing import List, Optional
 
 from app.schemas.users import UserResponse
@@ -59,4 +59,85 @@ class NoteCreate(BaseModel):
     content: str
     date: datetime  # User must provide this field
     category_name: Optional[str] = None 
-    note_id: Optional[str] = None
\ No newline at end of file
+    note_id: Optional[str] = None
+
+    @field_validator("date")
+    @classmethod
+    def normalize_date(cls, value: datetime) -> datetime:
+        """Store dates as naive UTC; notes.date is a timestamp without time zone."""
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+class NoteBulkUpsertRequest(BaseModel):
+    notes: List[NoteCreate] = Field(..., min_length=1, max_length=500)
+
+class NoteReorderRequest(BaseModel):
+    date: date  # Day whose notes are reordered
+    note_ids: List[str] = Field(..., min_length=1)  # All notes of that day, in their new order
+
+class ImportJobResponse(BaseModel):
+    id: str
+    format: str
+    source: Optional[str] = None
+    status: str
+    rows_read: int
+    rows_imported: int
+    rows_rejected: int
+    errors: List[str] = []
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class NoteStateResponse(BaseModel):
+    """Trash and archive state of a note after a delete, restore, archive or unarchive."""
+    id: str
+    is_deleted: bool
+    deleted_at: Optional[datetime] = None
+    is_archived: bool
+
+class AttachmentUploadRequest(BaseModel):
+    file_name: str = Field(..., min_length=1, max_length=255)
+    file_type: str = Field(..., min_length=1, max_length=50)  # MIME type, sent as Content-Type when uploading
+    file_size: int = Field(..., gt=0)  # Bytes; decides between a single PUT and a multipart upload
+
+class AttachmentUploadPart(BaseModel):
+    part_number: int
+    url: str
+
+class AttachmentUploadResponse(BaseModel):
+    """Where to PUT the file: `url` for a single upload, or one URL per part (each `part_size`
+    bytes, the last one shorter) for a multipart upload. Then call .../complete."""
+    attachment_id: str
+    headers: dict[str, str]  # Send these with every PUT; they are part of the signature
+    url: Optional[str] = None
+    part_size: Optional[int] = None
+    parts: List[AttachmentUploadPart] = []
+    expires_in: int
+
+class UploadedPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str  # The ETag header S3 returned for the part
+
+class AttachmentCompleteRequest(BaseModel):
+    parts: List[UploadedPart] = []  # Multipart uploads only
+
+class AttachmentDetailResponse(BaseModel):
+    id: str
+    note_id: str
+    file_name: str
+    file_type: str
+    file_size: int
+    file_url: Optional[str] = None
+    status: str
+    processed_at: Optional[datetime] = None  # Set once the worker has checked the file (and made a thumbnail)
+
+    class Config:
+        from_attributes = True
+
+class AttachmentDownloadResponse(BaseModel):
+    url: str
+    expires_in: Optional[int] = None  # Seconds the URL stays valid
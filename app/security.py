@@ -1,35 +1,53 @@
+import hashlib
 import re
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import ExpiredSignatureError, JWTError, jwt
 import os
 from dotenv import load_dotenv
 from typing import Annotated, Optional
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.db.models import User
-from app.core.config import Config, get_config
+from app.core.cache import TTLCache
+from app.core.config import get_config
+from app.schemas.users import UserResponse
+from app.services.password_hasher import get_pwd_context
 
-# Load settings from Config
-SECRET_KEY = Config().SECRET_KEY
+# Load settings from the shared Config instance
+config = get_config()
+SECRET_KEY = config.SECRET_KEY
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY is missing! Set it in the environment variables.")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = Config().ACCESS_TOKEN_EXPIRE_MINUTES
-REFRESH_TOKEN_EXPIRE_DAYS = Config().REFRESH_TOKEN_EXPIRE_DAYS
+ACCESS_TOKEN_EXPIRE_MINUTES = config.ACCESS_TOKEN_EXPIRE_MINUTES
+REFRESH_TOKEN_EXPIRE_DAYS = config.REFRESH_TOKEN_EXPIRE_DAYS
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="v1/auth/login")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Token subject (email) -> UserResponse snapshot, saves the users lookup on every authenticated request
+identity_cache = TTLCache(
+    maxsize=get_config().IDENTITY_CACHE_SIZE,
+    ttl=get_config().IDENTITY_CACHE_TTL_SECONDS,
+)
+
+# sha256(token) -> subject for tokens whose signature and claims were already verified
+token_cache = TTLCache(maxsize=get_config().TOKEN_CACHE_SIZE, ttl=0)
+
+def invalidate_cached_user(email: str) -> None:
+    """Drop the cached snapshot for a user; call after any change to their users row."""
+    identity_cache.pop(email)
 
 def hash_password(password: str) -> str:
     """Hashes a password using bcrypt."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies if a plain password matches the hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Creates a JWT access token."""
@@ -38,11 +56,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(
+async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)], 
-    db: Annotated[Session, Depends(get_db)]
-) -> User:
-    """Extract and validate JWT token, then return user object."""
+    db: Annotated[AsyncSession, Depends(get_async_db)]
+) -> UserResponse:
+    """Extract and validate JWT token, then return a snapshot of the user."""
     config = get_config()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -50,17 +68,42 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        user_email: str = payload.get("sub")  
-        if user_email is None:
+    token_digest = hashlib.sha256(token.encode()).digest()
+    user_email = token_cache.get(token_digest)
+    if user_email is None:
+        try:
+            payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
+            user_email: str = payload.get("sub")  
+            if user_email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+
+        # Tokens without exp are never cached; jwt.decode already rejected expired ones
+        expires_at = payload.get("exp")
+        if isinstance(expires_at, (int, float)):
+            token_cache.set(token_digest, user_email, ttl=expires_at - time.time())
     
-    user = db.query(User).filter(User.email == user_email).first() 
-    if user is None:
+    user = identity_cache.get(user_email)
+    if user is not None:
+        return user
+
+    result = await db.execute(
+        select(
+            User.id,
+            User.user_ulid,
+            User.email,
+            User.first_name,
+            User.last_name,
+            User.is_active,
+        ).where(User.email == user_email)
+    )
+    row = result.first()
+    if row is None:
         raise credentials_exception
+
+    user = UserResponse.model_validate(row)
+    identity_cache.set(user_email, user)
     return user
        
        
@@ -0,0 +1,224 @@
+"""Attachment processing queue: the attachment_jobs table and the worker that drains it.
+
+complete_upload enqueues a job in the same transaction that marks the attachment
+uploaded, so no request ever waits on processing. The worker claims due jobs with
+FOR UPDATE SKIP LOCKED, but does not keep the transaction open while a job runs: a
+claimed job is marked running with a lease (next_attempt_at = now + timeout + margin)
+and committed. If the worker dies, the job is due again once the lease runs out.
+
+The work itself (app.services.attachment_processing) is CPU-bound and runs in a
+multiprocessing pool, one job per process. multiprocessing.Pool rather than a
+ProcessPoolExecutor because a job past its timeout has to be stopped, and only a Pool
+can be terminated with its workers busy.
+"""
+import logging
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import get_config
+from app.db.models import Attachment, AttachmentJob, Note
+from app.services.attachment_processing import process_attachment
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Extra lease time for claiming, recording results and restarting a pool
+LEASE_MARGIN_SECONDS = 30
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+# Replace pool processes now and then, so memory an image library holds on to is returned
+TASKS_PER_PROCESS = 100
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    attempts: int
+    attachment_id: str
+    note_id: str
+    storage_key: str
+    file_type: str
+
+
+async def enqueue_attachment_job(db: AsyncSession, attachment_id: str) -> None:
+    """Queue processing of an uploaded attachment in the caller's transaction; the caller commits.
+
+    A no-op if the attachment already has a job (two requests completing the same upload).
+    """
+    await db.execute(
+        insert(AttachmentJob)
+        .values(attachment_id=attachment_id, status=JOB_PENDING, attempts=0)
+        .on_conflict_do_nothing(index_elements=[AttachmentJob.attachment_id])
+    )
+
+
+def claim_jobs(db: Session, limit: int, lease_seconds: float) -> list[ClaimedJob]:
+    """Mark up to `limit` due jobs running, leased for `lease_seconds`, and commit.
+
+    Due: pending jobs whose retry time has come, and running jobs whose lease ran out.
+    Each claim counts as an attempt, and the new attempt count fences the result: a worker
+    whose lease expired cannot overwrite the outcome of the one that took the job over.
+    """
+    # Core tables: an ORM UPDATE cannot return another entity's columns (UPDATE ... FROM attachments)
+    jobs, attachments = AttachmentJob.__table__, Attachment.__table__
+    due = (
+        select(jobs.c.id)
+        .where(jobs.c.status.in_((JOB_PENDING, JOB_RUNNING)), jobs.c.next_attempt_at <= func.now())
+        .order_by(jobs.c.next_attempt_at, jobs.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(jobs)
+        .where(jobs.c.id.in_(due.scalar_subquery()), jobs.c.attachment_id == attachments.c.id)
+        .values(
+            status=JOB_RUNNING,
+            attempts=jobs.c.attempts + 1,
+            next_attempt_at=func.now() + timedelta(seconds=lease_seconds),
+        )
+        .returning(
+            jobs.c.id, jobs.c.attempts,
+            attachments.c.id.label("attachment_id"), attachments.c.note_id, attachments.c.storage_key, attachments.c.file_type,
+        )
+    ).all()
+    db.commit()
+    return [ClaimedJob(*row) for row in rows]
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt: exponential in the attempts so far, with jitter."""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _finish_job(db: Session, job: ClaimedJob, **values) -> bool:
+    """Update the job if this worker still holds it. Returns False if another worker took it over."""
+    result = db.execute(
+        update(AttachmentJob)
+        .where(AttachmentJob.id == job.id, AttachmentJob.status == JOB_RUNNING, AttachmentJob.attempts == job.attempts)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def record_result(db: Session, job: ClaimedJob, result: dict) -> None:
+    """Write a job's outcome back and commit: the attachment's metadata and the note's search text, or a retry."""
+    if "error" in result:
+        if result["retryable"] and job.attempts < get_config().ATTACHMENT_JOB_MAX_ATTEMPTS:
+            values = {"status": JOB_PENDING, "next_attempt_at": func.now() + timedelta(seconds=retry_delay(job.attempts))}
+        else:
+            values = {"status": JOB_FAILED, "finished_at": func.now()}
+            logger.error("Giving up on attachment %s after %s attempts: %s", job.attachment_id, job.attempts, result["error"])
+        _finish_job(db, job, last_error=result["error"], **values)
+        db.commit()
+        return
+
+    if not _finish_job(db, job, status=JOB_DONE, finished_at=func.now(), last_error=None):
+        db.rollback()
+        return
+    db.execute(
+        update(Attachment)
+        .where(Attachment.id == job.attachment_id)
+        .values(
+            file_size=result["file_size"],
+            file_type=result["file_type"],
+            thumbnail_key=result.get("thumbnail_key"),
+            extracted_text=result.get("text"),
+            processed_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.get("text"):
+        _refresh_note_text(db, job.note_id)
+    db.commit()
+
+
+def _refresh_note_text(db: Session, note_id: str) -> None:
+    """Rebuild notes.attachment_text, which feeds search_vector, from the note's uploaded attachments."""
+    from app.services.attachment_uploads import ATTACHMENT_UPLOADED
+
+    text = (
+        select(func.left(
+            func.string_agg(Attachment.extracted_text, aggregate_order_by(literal("\n"), Attachment.created_at)),
+            get_config().ATTACHMENT_TEXT_MAX_CHARS,
+        ))
+        .where(Attachment.note_id == note_id, Attachment.status == ATTACHMENT_UPLOADED)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Note)
+        .where(Note.id == note_id)
+        # Not an edit by the user: leave updated_at (and the ETag derived from it) alone
+        .values(attachment_text=text, updated_at=Note.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _run_jobs(pool, jobs: list[ClaimedJob], limits: dict, timeout: float) -> tuple[list[dict], bool]:
+    """Run `jobs` in the pool, all started together. Returns their results and whether any timed out."""
+    pending = [pool.apply_async(process_attachment, (job.storage_key, job.file_type, limits)) for job in jobs]
+    deadline = time.monotonic() + timeout
+    results, timed_out = [], False
+    for async_result in pending:
+        try:
+            results.append(async_result.get(max(0.0, deadline - time.monotonic())))
+        except multiprocessing.TimeoutError:
+            timed_out = True
+            results.append({"error": f"Processing took longer than {timeout:g} seconds.", "retryable": True})
+        except Exception as e:  # The process died, or the result could not be unpickled
+            results.append({"error": f"{type(e).__name__}: {e}", "retryable": True})
+    return results, timed_out
+
+
+def run_worker(session_factory, processes: Optional[int] = None, once: bool = False, timeout: Optional[float] = None) -> int:
+    """Process jobs until none is due (`once`) or forever, polling every ATTACHMENT_JOB_POLL_SECONDS. Returns jobs run.
+
+    Claims as many jobs as there are processes, so every job starts at once and one
+    deadline serves as each job's timeout. A job still running at the deadline is stopped
+    by terminating the pool, which is then replaced.
+    """
+    config = get_config()
+    processes = processes or config.ATTACHMENT_WORKER_PROCESSES
+    timeout = timeout or config.ATTACHMENT_JOB_TIMEOUT_SECONDS
+    limits = {
+        "max_bytes": config.ATTACHMENT_PROCESS_MAX_BYTES,
+        "thumbnail_size": config.ATTACHMENT_THUMBNAIL_SIZE,
+        "max_chars": config.ATTACHMENT_TEXT_MAX_CHARS,
+    }
+    # spawn: the children only need the processing module, not a copy of this process's connections
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(processes, maxtasksperchild=TASKS_PER_PROCESS)
+    total = 0
+    try:
+        while True:
+            with session_factory() as db:
+                jobs = claim_jobs(db, processes, timeout + LEASE_MARGIN_SECONDS)
+            if not jobs:
+                if once:
+                    return total
+                time.sleep(config.ATTACHMENT_JOB_POLL_SECONDS)
+                continue
+
+            results, timed_out = _run_jobs(pool, jobs, limits, timeout)
+            if timed_out:
+                pool.terminate()
+                pool.join()
+                pool = context.Pool(processes, maxtasksperchild=TASKS_PER_PROCESS)
+            with session_factory() as db:
+                for job, result in zip(jobs, results):
+                    record_result(db, job, result)
+            total += len(jobs)
+            logger.info("Attachment jobs: %s processed", len(jobs))
+    finally:
+        pool.terminate()
+        pool.join()
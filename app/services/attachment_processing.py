@@ -0,0 +1,118 @@
+"""The CPU-bound part of attachment processing, run in the worker's process pool.
+
+For one stored object: check its real size and type, make a JPEG thumbnail of images and
+extract the text of PDFs and plain-text files. Pillow and pypdf are optional (see
+requirements-worker.txt); without them thumbnails or PDF text are skipped, everything
+else still runs.
+
+process_attachment never raises: the result travels back to the worker through a pipe,
+and not every exception (botocore's among them) survives pickling.
+"""
+import io
+import logging
+from typing import Optional
+from app.services import attachment_storage as storage
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 512
+THUMBNAIL_TYPE = "image/jpeg"
+PDF_TYPE = "application/pdf"
+
+# Leading bytes of the formats we treat specially or want to label correctly
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", PDF_TYPE),
+    (b"PK\x03\x04", "application/zip"),
+)
+THUMBNAIL_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """MIME type from the file's first bytes, or None if it is not one we recognise."""
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def thumbnail_key(key: str) -> str:
+    return f"{key}.thumbnail.jpg"
+
+
+def make_thumbnail(body: bytes, size: int) -> Optional[bytes]:
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(io.BytesIO(body)) as image:
+        image.draft("RGB", (size, size))  # Lets JPEG decode at a reduced scale
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=80)
+        return output.getvalue()
+
+
+def extract_pdf_text(body: bytes, max_chars: int) -> Optional[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    pages, length = [], 0
+    for page in PdfReader(io.BytesIO(body)).pages:
+        text = page.extract_text() or ""
+        pages.append(text)
+        length += len(text)
+        if length >= max_chars:
+            break
+    return "\n".join(pages)
+
+
+def _clean_text(text: Optional[str], max_chars: int) -> Optional[str]:
+    if not text:
+        return None
+    text = text.replace("\x00", "")[:max_chars].strip()  # Postgres text cannot hold NUL
+    return text or None
+
+
+def process_attachment(key: str, declared_type: str, limits: dict) -> dict:
+    """Process one stored object. Returns the verified metadata, or {"error", "retryable"}."""
+    try:
+        size = storage.object_size(key)
+        if size is None:
+            return {"error": "The stored file no longer exists.", "retryable": False}
+        if size > limits["max_bytes"]:
+            # Too large to process here: still verify the type from the first bytes
+            return {"file_size": size, "file_type": sniff_type(storage.read_object(key, SNIFF_BYTES)) or declared_type}
+
+        body = storage.read_object(key)
+        file_type = sniff_type(body[:SNIFF_BYTES]) or declared_type
+        result = {"file_size": len(body), "file_type": file_type}
+    except Exception as e:
+        # Network and S3 errors: the job is tried again later
+        return {"error": f"{type(e).__name__}: {e}", "retryable": True}
+
+    thumbnail = None
+    try:
+        if file_type in THUMBNAIL_TYPES:
+            thumbnail = make_thumbnail(body, limits["thumbnail_size"])
+        elif file_type == PDF_TYPE:
+            result["text"] = _clean_text(extract_pdf_text(body, limits["max_chars"]), limits["max_chars"])
+        elif file_type.startswith("text/"):
+            result["text"] = _clean_text(body.decode("utf-8", errors="replace"), limits["max_chars"])
+    except Exception as e:
+        # A file Pillow or pypdf cannot read will not get better on a retry: keep the metadata
+        logger.warning("Could not process attachment %s (%s): %s: %s", key, file_type, type(e).__name__, e)
+
+    if thumbnail is not None:
+        try:
+            storage.put_object(thumbnail_key(key), thumbnail, THUMBNAIL_TYPE)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}", "retryable": True}
+        result["thumbnail_key"] = thumbnail_key(key)
+    return result
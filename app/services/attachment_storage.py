@@ -0,0 +1,194 @@
+"""S3 access for attachments.
+
+File bytes never pass through the API: clients PUT them straight to S3 with presigned
+URLs (one URL, or one per part for a multipart upload) and the API only checks the
+result with a HEAD request. Presigning is a local signature computation, no S3 call.
+
+boto3 is imported when the client is first needed, so it costs nothing at cold start for
+requests that never touch attachments. The calls here block; async code runs them with
+asyncio.to_thread.
+"""
+import logging
+import math
+import threading
+from typing import TYPE_CHECKING, NamedTuple, Optional
+from urllib.parse import quote
+from app.core.config import get_config
+
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
+logger = logging.getLogger(__name__)
+
+# S3 limits: every part but the last is at least 5 MiB, at most 10,000 parts per upload
+MIN_PART_SIZE = 5 * 1024 ** 2
+MAX_PARTS = 10_000
+# S3 limit: keys per DeleteObjects request
+MAX_DELETE_KEYS = 1000
+
+_client: Optional["BaseClient"] = None
+_client_lock = threading.Lock()
+
+
+class PartPlan(NamedTuple):
+    part_size: int
+    part_count: int
+
+
+def get_s3_client() -> "BaseClient":
+    """Process-wide S3 client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            config = get_config()
+            _client = boto3.client(
+                "s3",
+                region_name=config.S3_REGION,
+                endpoint_url=config.S3_ENDPOINT_URL or None,
+                config=BotoConfig(
+                    signature_version="s3v4",
+                    # Stand-ins are reached by host:port, where bucket subdomains do not resolve
+                    s3={"addressing_style": "path" if config.S3_ENDPOINT_URL else "auto"},
+                    connect_timeout=5,
+                    read_timeout=10,
+                    retries={"max_attempts": 3, "mode": "standard"},
+                ),
+            )
+        return _client
+
+
+def object_key(user_id: int, attachment_id: str) -> str:
+    return f"attachments/{user_id}/{attachment_id}"
+
+
+def plan_parts(file_size: int, part_size: int) -> PartPlan:
+    """Part size and count for a multipart upload, within S3's part limits."""
+    part_size = max(part_size, MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS))
+    return PartPlan(part_size, max(1, math.ceil(file_size / part_size)))
+
+
+def presign_put(key: str, content_type: str, expires_in: int) -> str:
+    """URL for a single PUT of the whole file. The client must send the same Content-Type."""
+    return get_s3_client().generate_presigned_url(
+        "put_object",
+        Params={"Bucket": get_config().ATTACHMENT_BUCKET, "Key": key, "ContentType": content_type},
+        ExpiresIn=expires_in,
+    )
+
+
+def start_multipart_upload(key: str, content_type: str) -> str:
+    """Create a multipart upload (one S3 request) and return its upload id."""
+    response = get_s3_client().create_multipart_upload(
+        Bucket=get_config().ATTACHMENT_BUCKET, Key=key, ContentType=content_type,
+    )
+    return response["UploadId"]
+
+
+def presign_parts(key: str, upload_id: str, part_count: int, expires_in: int) -> list[str]:
+    """One PUT URL per part, part numbers 1..part_count."""
+    client = get_s3_client()
+    bucket = get_config().ATTACHMENT_BUCKET
+    return [
+        client.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+            ExpiresIn=expires_in,
+        )
+        for part_number in range(1, part_count + 1)
+    ]
+
+
+def complete_multipart_upload(key: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+    """Assemble the uploaded parts, given as (part_number, ETag) pairs."""
+    get_s3_client().complete_multipart_upload(
+        Bucket=get_config().ATTACHMENT_BUCKET,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": number, "ETag": etag} for number, etag in sorted(parts)]},
+    )
+
+
+def abort_multipart_upload(key: str, upload_id: str) -> None:
+    """Abort a multipart upload, freeing its parts. A no-op if it was already completed or aborted."""
+    from botocore.exceptions import ClientError
+
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=get_config().ATTACHMENT_BUCKET, Key=key, UploadId=upload_id)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            raise
+
+
+def object_size(key: str) -> Optional[int]:
+    """Size of the stored object from a HEAD request, or None if it does not exist."""
+    from botocore.exceptions import ClientError
+
+    try:
+        response = get_s3_client().head_object(Bucket=get_config().ATTACHMENT_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return response["ContentLength"]
+
+
+def read_object(key: str, max_bytes: Optional[int] = None) -> bytes:
+    """The object's content, or only its first `max_bytes` bytes (a ranged GET)."""
+    params = {"Bucket": get_config().ATTACHMENT_BUCKET, "Key": key}
+    if max_bytes is not None:
+        params["Range"] = f"bytes=0-{max_bytes - 1}"
+    return get_s3_client().get_object(**params)["Body"].read()
+
+
+def put_object(key: str, body: bytes, content_type: str) -> None:
+    get_s3_client().put_object(Bucket=get_config().ATTACHMENT_BUCKET, Key=key, Body=body, ContentType=content_type)
+
+
+def delete_object(key: str) -> None:
+    get_s3_client().delete_object(Bucket=get_config().ATTACHMENT_BUCKET, Key=key)
+
+
+def discard_objects(keys: list[str]) -> int:
+    """Delete the objects of attachments whose rows are already gone. Returns how many were deleted.
+
+    Never raises: the rows are committed, so an object S3 does not delete is only left
+    orphaned, and is logged.
+    """
+    keys = [key for key in keys if key]
+    if not keys:
+        return 0
+    if not get_config().ATTACHMENT_BUCKET:
+        logger.warning("ATTACHMENT_BUCKET is not set, %s objects of deleted attachments were left in place", len(keys))
+        return 0
+    deleted = 0
+    for start in range(0, len(keys), MAX_DELETE_KEYS):
+        batch = keys[start:start + MAX_DELETE_KEYS]
+        try:
+            response = get_s3_client().delete_objects(
+                Bucket=get_config().ATTACHMENT_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as e:
+            logger.warning("Could not delete %s objects of deleted attachments: %s", len(batch), e)
+            continue
+        errors = response.get("Errors", [])
+        for error in errors:
+            logger.warning("Could not delete object %s: %s", error.get("Key"), error.get("Message"))
+        deleted += len(batch) - len(errors)
+    return deleted
+
+
+def presign_get(key: str, file_name: str, expires_in: int) -> str:
+    """Short-lived download URL that saves the file under its original name."""
+    return get_s3_client().generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": get_config().ATTACHMENT_BUCKET,
+            "Key": key,
+            "ResponseContentDisposition": f"attachment; filename*=UTF-8''{quote(file_name)}",
+        },
+        ExpiresIn=expires_in,
+    )
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import ulid
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import get_config
+from app.db.models import Attachment, Note
+from app.schemas.notes import (
+    AttachmentDetailResponse,
+    AttachmentUploadPart,
+    AttachmentUploadRequest,
+    AttachmentUploadResponse,
+    UploadedPart,
+)
+from app.services import attachment_storage as storage
+from app.services.attachment_jobs import enqueue_attachment_job
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_PENDING = "pending"
+ATTACHMENT_UPLOADED = "uploaded"
+
+# How long past its URLs' expiry a pending upload is left alone: parts started just before
+# then may still be in flight, and the client has yet to complete the upload
+SWEEP_GRACE_SECONDS = 3600
+
+
+def download_path(note_id: str, attachment_id: str) -> str:
+    """Stored as file_url: the API route that hands out a fresh download URL."""
+    return f"/v1/notes/{note_id}/attachments/{attachment_id}"
+
+
+def _require_storage() -> None:
+    if not get_config().ATTACHMENT_BUCKET:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Attachment storage is not configured.")
+
+
+async def _get_attachment(db: AsyncSession, user_id: int, note_id: str, attachment_id: str) -> Attachment:
+    result = await db.execute(
+        select(Attachment)
+        .join(Note, Note.id == Attachment.note_id)
+        .where(Attachment.id == attachment_id, Attachment.note_id == note_id, Note.user_id == user_id)
+    )
+    attachment = result.scalars().first()
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found.")
+    return attachment
+
+
+async def create_upload(db: AsyncSession, user_id: int, note_id: str, request: AttachmentUploadRequest) -> AttachmentUploadResponse:
+    """Record a pending attachment and presign where the client uploads it.
+
+    Small files get one PUT URL. Files above ATTACHMENT_MULTIPART_THRESHOLD get a multipart
+    upload (the only S3 request made here) with a URL per part, so a large file can be sent
+    in parallel and a failed part retried on its own.
+    """
+    _require_storage()
+    config = get_config()
+    if request.file_size > config.ATTACHMENT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Attachments are limited to {config.ATTACHMENT_MAX_BYTES} bytes.",
+        )
+    result = await db.execute(select(Note.id).where(Note.id == note_id, Note.user_id == user_id, ~Note.is_deleted))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Note not found.")
+
+    attachment_id = ulid.new().str
+    key = storage.object_key(user_id, attachment_id)
+    expires_in = config.ATTACHMENT_URL_EXPIRES_SECONDS
+    upload = AttachmentUploadResponse(
+        attachment_id=attachment_id, headers={"Content-Type": request.file_type}, expires_in=expires_in,
+    )
+    upload_id = None
+    if request.file_size > config.ATTACHMENT_MULTIPART_THRESHOLD:
+        plan = storage.plan_parts(request.file_size, config.ATTACHMENT_PART_SIZE)
+        upload_id = await asyncio.to_thread(storage.start_multipart_upload, key, request.file_type)
+        urls = await asyncio.to_thread(storage.presign_parts, key, upload_id, plan.part_count, expires_in)
+        upload.headers = {}  # The content type was set when the multipart upload was created
+        upload.part_size = plan.part_size
+        upload.parts = [AttachmentUploadPart(part_number=number, url=url) for number, url in enumerate(urls, start=1)]
+    else:
+        upload.url = await asyncio.to_thread(storage.presign_put, key, request.file_type, expires_in)
+
+    db.add(Attachment(
+        id=attachment_id,
+        note_id=note_id,
+        file_name=request.file_name,
+        file_type=request.file_type,
+        storage_type="s3",
+        file_size=request.file_size,
+        file_url=download_path(note_id, attachment_id),
+        storage_key=key,
+        status=ATTACHMENT_PENDING,
+        upload_id=upload_id,
+    ))
+    await db.commit()
+    return upload
+
+
+async def complete_upload(
+    db: AsyncSession, user_id: int, note_id: str, attachment_id: str, parts: list[UploadedPart],
+) -> AttachmentDetailResponse:
+    """Confirm an upload with a HEAD request, mark the attachment uploaded and queue its processing.
+
+    A multipart upload is assembled first. The stored size comes from S3, not from the
+    request that started the upload. Calling this again for an uploaded attachment is a no-op.
+    The note's updated_at is bumped, as for any other edit, so its day's ETag changes.
+    """
+    attachment = await _get_attachment(db, user_id, note_id, attachment_id)
+    if attachment.status == ATTACHMENT_UPLOADED:
+        return AttachmentDetailResponse.model_validate(attachment)
+    _require_storage()
+    from botocore.exceptions import ClientError
+
+    if attachment.upload_id:
+        if not parts:
+            raise HTTPException(status_code=400, detail="parts are required to complete a multipart upload.")
+        try:
+            await asyncio.to_thread(
+                storage.complete_multipart_upload,
+                attachment.storage_key, attachment.upload_id, [(part.part_number, part.etag) for part in parts],
+            )
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            # NoSuchUpload: already completed by an earlier call that did not get to commit
+            if code != "NoSuchUpload":
+                raise HTTPException(status_code=400, detail=f"S3 did not accept the parts: {code}.")
+
+    size = await asyncio.to_thread(storage.object_size, attachment.storage_key)
+    if size is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The file has not been uploaded yet.")
+    if size > get_config().ATTACHMENT_MAX_BYTES:
+        await asyncio.to_thread(storage.delete_object, attachment.storage_key)
+        await db.delete(attachment)
+        await db.commit()
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="The uploaded file is too large.")
+
+    attachment.file_size = size
+    attachment.status = ATTACHMENT_UPLOADED
+    attachment.upload_id = None
+    await db.execute(
+        update(Note).where(Note.id == note_id).values(updated_at=func.now()).execution_options(synchronize_session=False)
+    )
+    await enqueue_attachment_job(db, attachment.id)
+    await db.commit()
+    return AttachmentDetailResponse.model_validate(attachment)
+
+
+async def download_url(
+    db: AsyncSession, user_id: int, note_id: str, attachment_id: str, thumbnail: bool = False,
+) -> tuple[str, Optional[int]]:
+    """A short-lived URL for the file, or its thumbnail, and its lifetime (None for attachments stored elsewhere)."""
+    attachment = await _get_attachment(db, user_id, note_id, attachment_id)
+    if attachment.status != ATTACHMENT_UPLOADED:
+        raise HTTPException(status_code=404, detail="Attachment not found.")
+    if thumbnail:
+        if not attachment.thumbnail_key:
+            raise HTTPException(status_code=404, detail="This attachment has no thumbnail.")
+        key, file_name = attachment.thumbnail_key, f"{os.path.splitext(attachment.file_name)[0]}-thumbnail.jpg"
+    elif not attachment.storage_key:
+        return attachment.file_url, None  # Attached before presigned uploads, file_url is the file itself
+    else:
+        key, file_name = attachment.storage_key, attachment.file_name
+    _require_storage()
+    expires_in = get_config().ATTACHMENT_URL_EXPIRES_SECONDS
+    url = await asyncio.to_thread(storage.presign_get, key, file_name, expires_in)
+    return url, expires_in
+
+
+def sweep_abandoned_uploads(db: Session, older_than: timedelta, batch_size: int) -> int:
+    """Delete pending attachments created more than `older_than` ago. Returns attachments deleted.
+
+    Their upload URLs have expired, so they can never be completed. Each batch's rows are
+    deleted and committed first; then their multipart uploads are aborted (S3 keeps, and
+    bills, the parts of an upload until then) and any object a single PUT left is deleted.
+    """
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - older_than  # Timestamps are stored as naive UTC
+    total = 0
+    while True:
+        abandoned = (
+            select(Attachment.id)
+            .where(Attachment.status == ATTACHMENT_PENDING, Attachment.created_at < cutoff)  # idx_attachment_pending
+            .order_by(Attachment.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = db.execute(
+            delete(Attachment)
+            .where(Attachment.id.in_(abandoned.scalar_subquery()))
+            .returning(Attachment.storage_key, Attachment.upload_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        for key, upload_id in rows:
+            if upload_id:
+                try:
+                    storage.abort_multipart_upload(key, upload_id)
+                except Exception as e:
+                    logger.warning("Could not abort multipart upload of %s: %s", key, e)
+        storage.discard_objects([key for key, _ in rows])
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
@@ -0,0 +1,70 @@
+from typing import Iterable
+import ulid
+from sqlalchemy import false, func, literal, select, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import get_config
+from app.db.models import Category, Color
+
+# Category of notes created without a category name
+DEFAULT_CATEGORY_NAME = "Uncategorized"
+
+# (user_id, category name) -> category id; categories are never renamed, so ids are stable
+category_cache = TTLCache(
+    maxsize=get_config().CATEGORY_CACHE_SIZE,
+    ttl=get_config().CATEGORY_CACHE_TTL_SECONDS,
+)
+
+
+async def resolve_category_ids(db: AsyncSession, user_id: int, names: Iterable[str]) -> dict[str, str]:
+    """Map category names to ids for a user, creating the missing ones; the caller commits.
+
+    Cached names cost no query. The rest go through one statement that inserts them with
+    ON CONFLICT DO NOTHING (uq_category_user_name) and returns both the new rows and the
+    ones that already existed, so concurrent requests never create duplicates.
+    """
+    names = set(names)
+    category_ids = {}
+    for name in names:
+        category_id = category_cache.get((user_id, name))
+        if category_id is not None:
+            category_ids[name] = category_id
+
+    missing = sorted(names - category_ids.keys())
+    if not missing:
+        return category_ids
+
+    random_color = select(Color.id).order_by(func.random()).limit(1).scalar_subquery()
+    inserted = (
+        insert(Category)
+        .values([
+            {"id": ulid.new().str, "user_id": user_id, "name": name, "color_id": random_color}
+            for name in missing
+        ])
+        .on_conflict_do_nothing(index_elements=[Category.user_id, Category.name])
+        .returning(Category.name, Category.id)
+        .cte("inserted")
+    )
+    # Rows inserted by this statement are not visible to the second SELECT (same snapshot)
+    stmt = select(inserted.c.name, inserted.c.id, true().label("created")).union_all(
+        select(Category.name, Category.id, false().label("created"))
+        .where(Category.user_id == user_id, Category.name.in_(missing))
+    )
+    rows = (await db.execute(stmt)).all()
+
+    # A concurrent transaction committed one of these names after our snapshot was taken
+    unresolved = set(missing) - {name for name, _, _ in rows}
+    if unresolved:
+        result = await db.execute(
+            select(Category.name, Category.id, literal(False))
+            .where(Category.user_id == user_id, Category.name.in_(unresolved))
+        )
+        rows += result.all()
+
+    for name, category_id, created in rows:
+        category_ids[name] = category_id
+        # Only cache committed rows; a new one would dangle if this transaction rolls back
+        if not created:
+            category_cache.set((user_id, name), category_id)
+    return category_ids
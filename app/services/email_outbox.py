@@ -0,0 +1,207 @@
+"""Transactional email outbox: the email_outbox table and the worker that drains it.
+
+Routes enqueue emails in the transaction of the change that triggers them. The worker
+claims due rows with FOR UPDATE SKIP LOCKED, marks them sending with a lease
+(next_attempt_at = now + the longest the batch can take) and commits before calling
+Brevo, so no row lock or transaction is held during HTTP requests. Results are written
+back in a second short transaction. If a worker dies in between, the rows are due again
+once the lease runs out and are sent again: delivery is at least once, with the window
+for a duplicate narrowed to the moments between Brevo's response and that commit.
+
+Bodies carry password reset and verification links, so a row's html_content is cleared
+once it is sent or given up on, and purge_emails deletes finished rows after
+EMAIL_RETENTION_DAYS.
+"""
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from app.core.config import get_config
+from app.db.models import EmailOutbox
+
+if TYPE_CHECKING:
+    # The HTTP client (and requests) is only needed by the worker, not by routes that enqueue
+    from app.email_sender import BrevoClient, EmailDeliveryError
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PENDING = "pending"
+EMAIL_SENDING = "sending"
+EMAIL_SENT = "sent"
+EMAIL_FAILED = "failed"
+
+# Extra lease time for claiming and recording results
+LEASE_MARGIN_SECONDS = 30
+# A rejected API key is our problem, not the message's
+AUTH_ERROR_STATUSES = (401, 403)
+# What html_content becomes once an email is sent or given up on: bodies carry password
+# reset and verification links, which should not outlive their delivery in the table
+SCRUBBED_CONTENT = ""
+
+
+class ClaimedEmail(NamedTuple):
+    id: int
+    attempts: int
+    lease_until: datetime
+    to_email: str
+    subject: str
+    html_content: str
+
+
+# A message id once Brevo accepted the email, else the error
+DeliveryResult = Union[Optional[str], "EmailDeliveryError"]
+
+
+def enqueue_email(db, to_email: str, subject: str, html_content: str) -> EmailOutbox:
+    """Queue an email in the caller's transaction (sync or async session); the caller commits."""
+    email = EmailOutbox(to_email=to_email, subject=subject, html_content=html_content, status=EMAIL_PENDING, attempts=0)
+    db.add(email)
+    return email
+
+
+def retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+    """Seconds before the next attempt: exponential in the attempts so far, with jitter."""
+    config = get_config()
+    delay = min(config.EMAIL_RETRY_MAX_SECONDS, config.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    delay *= random.uniform(0.5, 1.0)  # Spread out emails that failed together
+    return max(delay, retry_after or 0)
+
+
+def claim_emails(db: Session, limit: int, lease_seconds: float) -> list[ClaimedEmail]:
+    """Mark up to `limit` due emails sending, leased for `lease_seconds`, and commit.
+
+    Due: pending emails whose retry time has come, and sending emails whose lease ran out.
+    The lease expiry fences the result: a worker whose lease expired cannot overwrite the
+    outcome of the one that took the email over.
+    """
+    outbox = EmailOutbox.__table__
+    due = (
+        select(outbox.c.id)
+        .where(outbox.c.status.in_((EMAIL_PENDING, EMAIL_SENDING)), outbox.c.next_attempt_at <= func.now())
+        .order_by(outbox.c.next_attempt_at, outbox.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(outbox)
+        .where(outbox.c.id.in_(due.scalar_subquery()))
+        .values(status=EMAIL_SENDING, next_attempt_at=func.now() + timedelta(seconds=lease_seconds))
+        .returning(
+            outbox.c.id, outbox.c.attempts, outbox.c.next_attempt_at,
+            outbox.c.to_email, outbox.c.subject, outbox.c.html_content,
+        )
+    ).all()
+    db.commit()
+    return sorted((ClaimedEmail(*row) for row in rows), key=lambda email: email.id)
+
+
+def _deliver(client: "BrevoClient", emails: list[ClaimedEmail]) -> list[DeliveryResult]:
+    """Send `emails` in one request, falling back to one request each if Brevo rejects the batch."""
+    from app.email_sender import EmailDeliveryError, EmailMessage
+
+    try:
+        return client.send([EmailMessage(e.to_email, e.subject, e.html_content) for e in emails])
+    except EmailDeliveryError as error:
+        if error.retryable or error.status_code in AUTH_ERROR_STATUSES or len(emails) == 1:
+            return [error] * len(emails)
+        # A 4xx for the whole batch: find the offending message(s) without holding back the rest
+        return [result for email in emails for result in _deliver(client, [email])]
+
+
+def _finish_email(db: Session, email: ClaimedEmail, **values) -> bool:
+    """Update the email if this worker still holds it. Returns False if another worker took it over."""
+    result = db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == email.id, EmailOutbox.status == EMAIL_SENDING, EmailOutbox.next_attempt_at == email.lease_until)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def record_result(db: Session, email: ClaimedEmail, result: DeliveryResult) -> None:
+    """Write an email's outcome back, without committing: sent, a retry, or given up."""
+    from app.email_sender import EmailDeliveryError
+
+    if not isinstance(result, EmailDeliveryError):
+        _finish_email(
+            db, email,
+            status=EMAIL_SENT, attempts=email.attempts + 1, message_id=result, sent_at=func.now(), last_error=None,
+            html_content=SCRUBBED_CONTENT,
+        )
+        return
+
+    if result.status_code in AUTH_ERROR_STATUSES:
+        # Nothing wrong with the message: retry it once the API key is fixed, without using up its attempts
+        _finish_email(
+            db, email,
+            status=EMAIL_PENDING, last_error=str(result), next_attempt_at=func.now() + timedelta(seconds=retry_delay(1)),
+        )
+        return
+
+    attempts = email.attempts + 1
+    if result.retryable and attempts < get_config().EMAIL_MAX_ATTEMPTS:
+        values = {"status": EMAIL_PENDING, "next_attempt_at": func.now() + timedelta(seconds=retry_delay(attempts, result.retry_after))}
+    else:
+        values = {"status": EMAIL_FAILED, "html_content": SCRUBBED_CONTENT}
+        logger.error("Giving up on email %s to %s after %s attempts: %s", email.id, email.to_email, attempts, result)
+    _finish_email(db, email, attempts=attempts, last_error=str(result), **values)
+
+
+def drain_once(db: Session, client: "BrevoClient", batch_size: Optional[int] = None) -> int:
+    """Claim one batch of due emails, send it and record the results. Returns how many emails were attempted."""
+    config = get_config()
+    batch_size = batch_size or config.EMAIL_BATCH_SIZE
+    # Worst case: the batch request, then one request per email
+    lease_seconds = (batch_size + 1) * config.EMAIL_HTTP_TIMEOUT_SECONDS + LEASE_MARGIN_SECONDS
+    emails = claim_emails(db, batch_size, lease_seconds)
+    if not emails:
+        return 0
+
+    results = _deliver(client, emails)
+    for email, result in zip(emails, results):
+        record_result(db, email, result)
+    db.commit()
+    auth_error = next((r for r in results if getattr(r, "status_code", None) in AUTH_ERROR_STATUSES), None)
+    if auth_error is not None:
+        logger.error("Brevo rejected the API key, emails will be retried: %s", auth_error)
+    return len(emails)
+
+
+def purge_emails(db: Session, older_than: timedelta, batch_size: int) -> int:
+    """Delete sent and failed emails created more than `older_than` ago, one transaction per batch. Returns emails deleted."""
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - older_than  # Timestamps are stored as naive UTC
+    total = 0
+    while True:
+        expired = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status.in_((EMAIL_SENT, EMAIL_FAILED)), EmailOutbox.created_at < cutoff)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = db.execute(
+            delete(EmailOutbox).where(EmailOutbox.id.in_(expired.scalar_subquery())).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+def run_worker(session_factory, client: "BrevoClient", once: bool = False, batch_size: Optional[int] = None) -> int:
+    """Drain the outbox until it is empty (`once`) or forever, polling every EMAIL_POLL_SECONDS. Returns emails attempted."""
+    poll_seconds = get_config().EMAIL_POLL_SECONDS
+    total = 0
+    while True:
+        with session_factory() as db:
+            attempted = drain_once(db, client, batch_size)
+        total += attempted
+        if attempted:
+            logger.info("Email outbox: %s emails attempted", attempted)
+            continue
+        if once:
+            return total
+        time.sleep(poll_seconds)
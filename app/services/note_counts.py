@@ -0,0 +1,88 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import NoteDailyCount
+
+UNCATEGORIZED_KEY = "uncategorized"
+
+
+def _key(note_date: datetime, category_id: Optional[str]) -> tuple[date, str]:
+    day = note_date.date() if isinstance(note_date, datetime) else note_date
+    return day, category_id or UNCATEGORIZED_KEY
+
+
+class NoteCountDeltas:
+    """Collects changes to note_daily_counts for one user and writes them in a single upsert.
+
+    Call add/remove/move for every note that is created, deleted or moved to another
+    day or category, then `await deltas.apply(db)` in the same transaction as the notes.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._deltas: dict[tuple[date, str], int] = defaultdict(int)
+
+    def add(self, note_date: datetime, category_id: Optional[str], count: int = 1) -> None:
+        self._deltas[_key(note_date, category_id)] += count
+
+    def remove(self, note_date: datetime, category_id: Optional[str], count: int = 1) -> None:
+        self._deltas[_key(note_date, category_id)] -= count
+
+    def move(self, old_date: datetime, old_category_id: Optional[str], new_date: datetime, new_category_id: Optional[str]) -> None:
+        """Record a note changing day and/or category."""
+        self.remove(old_date, old_category_id)
+        self.add(new_date, new_category_id)
+
+    async def apply(self, db: AsyncSession) -> None:
+        """Upsert all non-zero deltas; the caller commits."""
+        rows = [
+            {"user_id": self.user_id, "day": day, "category_id": category_id, "count": delta}
+            for (day, category_id), delta in sorted(self._deltas.items())  # fixed lock order across writers
+            if delta
+        ]
+        self._deltas.clear()
+        if not rows:
+            return
+
+        stmt = insert(NoteDailyCount).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NoteDailyCount.user_id, NoteDailyCount.day, NoteDailyCount.category_id],
+            set_={"count": NoteDailyCount.count + stmt.excluded.count},
+        )
+        await db.execute(stmt)
+
+
+BACKFILL_SQL = f"""
+INSERT INTO note_daily_counts (user_id, day, category_id, count)
+SELECT user_id, CAST(date AS DATE), COALESCE(category_id, '{UNCATEGORIZED_KEY}'), COUNT(*)
+FROM notes
+WHERE NOT is_deleted AND NOT is_archived {{user_filter}}
+GROUP BY 1, 2, 3
+"""
+
+
+def backfill_note_counts(db, user_id: Optional[int] = None) -> int:
+    """Rebuild note_daily_counts from live notes, for one user or everyone. Returns rows written.
+
+    Runs on a sync Session, in one transaction that first locks note_daily_counts in SHARE
+    ROW EXCLUSIVE mode. Every writer takes ROW EXCLUSIVE on the table when it applies its
+    deltas, so the lock waits for writers that already did to commit (their notes are then
+    visible to the INSERT ... SELECT) and holds back the rest until the rebuild commits
+    (their notes were not visible, so their deltas land on top of it). Either way a
+    concurrent write is counted once. Writes to notes without count changes are not blocked.
+    """
+    params = {}
+    where = user_filter = ""
+    if user_id is not None:
+        where = "WHERE user_id = :user_id"
+        user_filter = "AND user_id = :user_id"
+        params["user_id"] = user_id
+
+    db.execute(text("LOCK TABLE note_daily_counts IN SHARE ROW EXCLUSIVE MODE"))
+    db.execute(text(f"DELETE FROM note_daily_counts {where}"), params)
+    result = db.execute(text(BACKFILL_SQL.format(user_filter=user_filter)), params)
+    db.commit()
+    return result.rowcount
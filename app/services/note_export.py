@@ -0,0 +1,120 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import orjson
+from sqlalchemy import JSON, func, literal_column, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_sessionmaker
+from app.db.models import Attachment, Category, Color, Note, NoteDailyCount
+from app.services.attachment_uploads import ATTACHMENT_UPLOADED
+from app.services.note_trash import LIVE_NOTE
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+CSV_COLUMNS = (
+    "id", "date", "title", "content", "pinned", "order_index", "is_archived", "is_deleted",
+    "created_at", "updated_at", "category_id", "category_name", "category_color", "attachments",
+)
+
+
+async def count_export_rows(db: AsyncSession, user_id: int, start: Optional[datetime], end: Optional[datetime]) -> int:
+    """Number of notes an export would contain, read from note_daily_counts instead of notes."""
+    stmt = select(func.coalesce(func.sum(NoteDailyCount.count), 0)).where(NoteDailyCount.user_id == user_id)
+    if start is not None:
+        stmt = stmt.where(NoteDailyCount.day >= start.date())
+    if end is not None:
+        stmt = stmt.where(NoteDailyCount.day < end.date())
+    return int((await db.execute(stmt)).scalar_one())
+
+
+def _export_query(user_id: int, start: Optional[datetime], end: Optional[datetime]):
+    # Attachments are folded into one JSON array per note, so each note is exactly one row
+    attachments = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    func.json_build_object(
+                        literal_column("'id'"), Attachment.id,
+                        literal_column("'file_name'"), Attachment.file_name,
+                        literal_column("'file_type'"), Attachment.file_type,
+                        literal_column("'file_size'"), Attachment.file_size,
+                        literal_column("'file_url'"), Attachment.file_url,
+                    )
+                ),
+                literal_column("'[]'::json"),
+            )
+        )
+        .where(Attachment.note_id == Note.id, Attachment.status == ATTACHMENT_UPLOADED)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Note.id,
+            Note.date,
+            Note.title,
+            Note.content,
+            Note.pinned,
+            Note.order_index,
+            Note.is_archived,
+            Note.is_deleted,
+            Note.created_at,
+            Note.updated_at,
+            Category.id.label("category_id"),
+            Category.name.label("category_name"),
+            Color.color.label("category_color"),
+            type_coerce(attachments, JSON).label("attachments"),
+        )
+        .outerjoin(Category, Category.id == Note.category_id)
+        .outerjoin(Color, Color.id == Category.color_id)
+        .where(Note.user_id == user_id, LIVE_NOTE)  # Trashed and archived notes are not exported
+        .order_by(Note.date, Note.order_index, Note.id)  # idx_note_live_user_date_order, no sort step
+    )
+    if start is not None:
+        stmt = stmt.where(Note.date >= start)
+    if end is not None:
+        stmt = stmt.where(Note.date < end)
+    return stmt
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        values = row._asdict()
+        values["attachments"] = orjson.dumps(values["attachments"]).decode()
+        writer.writerow([values[column] for column in CSV_COLUMNS])
+    return buffer.getvalue().encode()
+
+
+async def stream_export(
+    user_id: int,
+    export_format: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    yield_per: int = 1000,
+) -> AsyncIterator[bytes]:
+    """Encoded chunks of a user's notes, `yield_per` notes at a time, oldest first.
+
+    Rows come from a server-side cursor, so memory depends on the chunk size and not on
+    the number of notes. The generator opens its own session: it keeps running after the
+    route has returned and its dependencies have been closed.
+    """
+    if export_format == "csv":
+        yield _csv_chunk([], header=True)
+
+    async with get_async_sessionmaker()() as db:
+        result = await db.stream(
+            _export_query(user_id, start, end).execution_options(yield_per=yield_per)
+        )
+        async for rows in result.partitions():
+            yield _csv_chunk(rows) if export_format == "csv" else _ndjson_chunk(rows)
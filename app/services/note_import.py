@@ -0,0 +1,245 @@
+import csv
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+import orjson
+import ulid
+from pydantic import ValidationError
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+from app.core.config import get_config
+from app.db.models import ImportJob, Note
+from app.schemas.notes import NoteCreate
+from app.services.categories import DEFAULT_CATEGORY_NAME, resolve_category_ids
+from app.services.note_counts import NoteCountDeltas
+from app.services.note_ordering import ORDER_GAP, last_order_indexes
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+MAX_STORED_ERRORS = 100
+# A running job whose checkpoint has not moved for this long is treated as abandoned
+STALE_AFTER = timedelta(minutes=10)
+
+COPY_COLUMNS = (
+    "id", "user_id", "title", "content", "date", "category_id", "order_index",
+    "pinned", "is_deleted", "is_archived",
+)
+TITLE_MAX_LENGTH = Note.title.type.length
+
+
+def _utcnow() -> datetime:
+    # Timestamps are stored as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[str, bool]]:
+    """Split a byte stream into lines, keeping line endings (CSV fields may contain newlines).
+
+    Yields (line, valid) pairs. A line that is not valid UTF-8 is decoded with replacement
+    characters, so it still splits into records the same way, and flagged invalid.
+    """
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            # b"\n" never occurs inside a multi-byte UTF-8 sequence, so lines decode on their own
+            text, valid = _decode(line + b"\n", "utf-8-sig" if first else "utf-8")
+            yield text, valid
+            first = False
+    if pending:
+        yield _decode(pending, "utf-8-sig" if first else "utf-8")
+
+
+def _decode(line: bytes, encoding: str) -> tuple[str, bool]:
+    try:
+        return line.decode(encoding, errors="strict"), True
+    except UnicodeDecodeError:
+        return line.decode(encoding, errors="replace"), False
+
+
+async def read_records(chunks: AsyncIterator[bytes], import_format: str) -> AsyncIterator[tuple[Optional[dict], Optional[str]]]:
+    """Parse NDJSON or CSV (with a header row) incrementally into (record, error) pairs.
+
+    Exactly one of the two is set, and every source record yields one pair, so record
+    numbers stay stable between runs. Blank lines are skipped. A record with bytes that
+    are not UTF-8 is rejected like any other invalid record.
+    """
+    if import_format == "ndjson":
+        async for line, valid in _lines(chunks):
+            if not line.strip():
+                continue
+            if not valid:
+                yield None, "invalid UTF-8"
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield None, f"invalid JSON ({e})"
+                continue
+            if isinstance(record, dict):
+                yield record, None
+            else:
+                yield None, "expected a JSON object"
+        return
+
+    header = None
+    pending, pending_valid = "", True
+    async for line, valid in _lines(chunks):
+        pending += line
+        pending_valid = pending_valid and valid
+        if pending.count('"') % 2:
+            continue  # Inside a quoted field that continues on the next line
+        text, text_valid = pending, pending_valid
+        pending, pending_valid = "", True
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if not text_valid:
+            yield None, "invalid UTF-8"
+            continue
+        if len(values) != len(header):
+            yield None, f"expected {len(header)} fields, got {len(values)}"
+            continue
+        # Empty cells fall back to the NoteCreate defaults
+        yield {name: value for name, value in zip(header, values) if value != ""}, None
+
+    if pending.strip():
+        yield None, "unterminated quoted field"
+
+
+def _validate(record: dict) -> tuple[Optional[NoteCreate], Optional[str]]:
+    try:
+        note = NoteCreate.model_validate(record)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        )
+    if len(note.title) > TITLE_MAX_LENGTH:
+        return None, f"title: longer than {TITLE_MAX_LENGTH} characters"
+    return note, None
+
+
+async def create_import_job(db: AsyncSession, user_id: int, import_format: str, source: Optional[str] = None) -> ImportJob:
+    job = ImportJob(user_id=user_id, format=import_format, source=source, status="pending", errors=[])
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def claim_import_job(db: AsyncSession, job: ImportJob, force: bool = False) -> bool:
+    """Mark the job running unless it is done or another run is actively working on it.
+
+    `force` takes over a running job regardless, for when that run is known to be dead.
+    """
+    conditions = [ImportJob.id == job.id, ImportJob.status != "completed"]
+    if not force:
+        conditions.append(or_(ImportJob.status != "running", ImportJob.updated_at < _utcnow() - STALE_AFTER))
+    result = await db.execute(
+        update(ImportJob)
+        .where(*conditions)
+        .values(status="running", finished_at=None, updated_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await db.refresh(job)
+    return result.rowcount == 1
+
+
+async def _load_chunk(db: AsyncSession, job: ImportJob, notes: list[NoteCreate], errors: list[str], rows_read: int) -> None:
+    """Insert one chunk of notes with COPY and advance the checkpoint in the same transaction."""
+    if notes:
+        category_ids = await resolve_category_ids(
+            db, job.user_id, {note.category_name or DEFAULT_CATEGORY_NAME for note in notes}
+        )
+        # Always runs a query, which also begins the transaction the COPY below joins
+        last_order_index = await last_order_indexes(db, job.user_id, (note.date.date() for note in notes))
+
+        count_deltas = NoteCountDeltas(job.user_id)
+        records = []
+        for note in notes:
+            day = note.date.date()
+            order_index = last_order_index.get(day, 0) + ORDER_GAP
+            last_order_index[day] = order_index
+            category_id = category_ids[note.category_name or DEFAULT_CATEGORY_NAME]
+            records.append((
+                ulid.new().str, job.user_id, note.title, note.content, note.date, category_id, order_index,
+                False, False, False,
+            ))
+            count_deltas.add(note.date, category_id)
+
+        connection = await (await db.connection()).get_raw_connection()
+        await connection.driver_connection.copy_records_to_table("notes", records=records, columns=COPY_COLUMNS)
+        await count_deltas.apply(db)
+
+    job.rows_read = rows_read
+    job.rows_imported += len(notes)
+    job.rows_rejected += len(errors)
+    if errors and len(job.errors) < MAX_STORED_ERRORS:
+        job.errors = job.errors + errors[:MAX_STORED_ERRORS - len(job.errors)]
+    await db.commit()
+    logger.info(
+        "Import %s: %s records read, %s imported, %s rejected",
+        job.id, job.rows_read, job.rows_imported, job.rows_rejected,
+    )
+
+
+async def run_import(db: AsyncSession, job: ImportJob, chunks: AsyncIterator[bytes]) -> ImportJob:
+    """Validate and load notes from `chunks`, committing a checkpoint every IMPORT_CHUNK_SIZE records.
+
+    The job must have been claimed. Records before `job.rows_read` were loaded by an
+    earlier run and are skipped, so re-running with the same file resumes the import.
+    Imported notes are always new: ids in the source are ignored.
+    """
+    chunk_size = get_config().IMPORT_CHUNK_SIZE
+    resume_after = job.rows_read
+    position = 0
+    notes, errors = [], []
+    try:
+        async for record, error in read_records(chunks, job.format):
+            position += 1
+            if position <= resume_after:
+                continue
+            if error is None:
+                note, error = _validate(record)
+                if note is not None:
+                    notes.append(note)
+            if error is not None:
+                errors.append(f"record {position}: {error}")
+            if position - job.rows_read >= chunk_size:
+                await _load_chunk(db, job, notes, errors, position)
+                notes, errors = [], []
+
+        await _load_chunk(db, job, notes, errors, max(position, job.rows_read))
+        job.status = "completed"
+        job.finished_at = _utcnow()
+        await db.commit()
+    except ClientDisconnect:
+        logger.warning("Import %s interrupted by the client after %s records", job.id, job.rows_read)
+        await _stop(db, job, "interrupted")
+        raise
+    except Exception:
+        logger.exception("Import %s failed after %s records", job.id, job.rows_read)
+        await _stop(db, job, "failed")
+        raise
+    return job
+
+
+async def _stop(db: AsyncSession, job: ImportJob, status: str) -> None:
+    """Record that a run ended early; the checkpoint stays at the last committed chunk."""
+    job_id = job.id  # The rollback expires `job`, and an async session cannot lazy-load it back
+    await db.rollback()
+    await db.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id)
+        .values(status=status, finished_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await db.refresh(job)
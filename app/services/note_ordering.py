@@ -0,0 +1,118 @@
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import Date, and_, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Note
+from app.services.note_trash import LIVE_NOTE
+
+# Notes in a day are ordered by sparse order_index values (GAP apart), so a note can be
+# appended or moved between two neighbours without renumbering the rest of the day.
+# Equal indexes (two concurrent appends) are ordered by id, which is time-ordered (ULID).
+ORDER_GAP = 1024
+
+
+def next_order_index(user_id: int, day_start: datetime, day_end: datetime):
+    """SQL expression for the index after the last note of a day, evaluated inside the INSERT."""
+    return (
+        select(func.coalesce(func.max(Note.order_index), 0) + ORDER_GAP)
+        .where(Note.user_id == user_id, Note.date >= day_start, Note.date < day_end, LIVE_NOTE)
+        .scalar_subquery()
+    )
+
+
+async def last_order_indexes(db: AsyncSession, user_id: int, days: Iterable[date]) -> dict[date, int]:
+    """Highest order_index per day for the given days, in one grouped query; days without notes are absent."""
+    day_ranges = []
+    for day in sorted(set(days)):
+        start = datetime.combine(day, time.min)
+        day_ranges.append((start, start + timedelta(days=1)))
+    if not day_ranges:
+        return {}
+
+    result = await db.execute(
+        select(cast(Note.date, Date), func.max(Note.order_index))
+        .where(
+            Note.user_id == user_id,
+            LIVE_NOTE,
+            or_(*(and_(Note.date >= start, Note.date < end) for start, end in day_ranges))
+        )
+        .group_by(cast(Note.date, Date))
+    )
+    return dict(result.all())
+
+
+def _longest_increasing_positions(values: list[int]) -> set[int]:
+    """Positions of one longest strictly increasing subsequence of `values`."""
+    tails: list[int] = []          # smallest tail value of an increasing run of each length
+    tail_positions: list[int] = []
+    previous: list[Optional[int]] = [None] * len(values)
+    for position, value in enumerate(values):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_positions.append(position)
+        else:
+            tails[length] = value
+            tail_positions[length] = position
+        previous[position] = tail_positions[length - 1] if length else None
+
+    kept = set()
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        kept.add(position)
+        position = previous[position]
+    return kept
+
+
+def plan_reorder(ordered_ids: list[str], current: dict[str, int]) -> dict[str, int]:
+    """New order_index values that put `ordered_ids` in that order, touching as few notes as possible.
+
+    Notes that are already in increasing order keep their index; the others get values in
+    the gap between their new neighbours. Only when a gap is exhausted is the whole day
+    renumbered. Returns only the notes whose index changes.
+    """
+    values = [current[note_id] for note_id in ordered_ids]
+    kept = _longest_increasing_positions(values)
+
+    planned = list(values)
+    position = 0
+    while position < len(values):
+        if position in kept:
+            position += 1
+            continue
+
+        run_start = position
+        while position < len(values) and position not in kept:
+            position += 1
+        run_length = position - run_start
+        low = planned[run_start - 1] if run_start > 0 else None
+        high = planned[position] if position < len(values) else None
+
+        if low is None and high is None:
+            step, base = ORDER_GAP, 0
+        elif high is None:
+            step, base = ORDER_GAP, low
+        elif low is None:
+            step, base = ORDER_GAP, high - (run_length + 1) * ORDER_GAP
+        else:
+            step, base = (high - low) // (run_length + 1), low
+            if step < 1:
+                return _renumber(ordered_ids, current)
+
+        for offset in range(run_length):
+            planned[run_start + offset] = base + step * (offset + 1)
+
+    return {
+        note_id: index
+        for note_id, index in zip(ordered_ids, planned)
+        if current[note_id] != index
+    }
+
+
+def _renumber(ordered_ids: list[str], current: dict[str, int]) -> dict[str, int]:
+    return {
+        note_id: (position + 1) * ORDER_GAP
+        for position, note_id in enumerate(ordered_ids)
+        if current[note_id] != (position + 1) * ORDER_GAP
+    }
@@ -0,0 +1,132 @@
+import base64
+import binascii
+import html
+import json
+from typing import Optional
+from sqlalchemy import cast, func, literal, select, text, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_config
+from app.db.models import Note
+from app.services.note_trash import LIVE_NOTE
+
+# Text search configuration of notes.search_vector (see the Note model)
+SEARCH_CONFIG = "english"
+# ts_headline marks matches with control characters that cannot come from the note (they are
+# stripped from its text first); highlight() escapes the rest and turns them into <mark> tags
+START_SEL, STOP_SEL = "\x01", "\x02"
+SNIPPET_OPTIONS = f'StartSel="{START_SEL}", StopSel="{STOP_SEL}", MaxFragments=2, MaxWords=30, MinWords=10'
+TITLE_OPTIONS = f'StartSel="{START_SEL}", StopSel="{STOP_SEL}", HighlightAll=true'
+
+
+def _without_selectors(column):
+    return func.translate(column, START_SEL + STOP_SEL, "")
+
+
+def highlight(headline: Optional[str]) -> Optional[str]:
+    """HTML for a ts_headline result: the note's text escaped, matches wrapped in <mark>."""
+    if headline is None:
+        return None
+    return html.escape(headline).replace(START_SEL, "<mark>").replace(STOP_SEL, "</mark>")
+
+
+def encode_cursor(rank: float, note_id: str) -> str:
+    """Opaque keyset cursor pointing just after the (rank, id) of the last result."""
+    return base64.urlsafe_b64encode(json.dumps([rank, note_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        rank, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(rank, (int, float)) or not isinstance(note_id, str):
+        raise ValueError("Invalid cursor")
+    return float(rank), note_id
+
+
+async def search_notes(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int,
+    after: Optional[tuple[float, str]] = None,
+) -> tuple[list[dict], Optional[str], bool]:
+    """One page of a user's notes matching `query`, best match first. Returns (results, next_cursor, truncated).
+
+    `after` is a decoded cursor: only results ranked below that (rank, id) are returned.
+
+    Ranking has to look at every candidate, so it is bounded: only the user's
+    SEARCH_CANDIDATE_LIMIT most recent matches are ranked, and `truncated` tells the
+    client that older matches were left out. Rare terms are found through the GIN index;
+    common ones stop early on a backward scan of (user_id, date). Titles and content are
+    read, and ts_headline run, for the notes of the returned page only.
+    """
+    config = cast(literal(SEARCH_CONFIG), REGCONFIG)
+    ts_query = func.websearch_to_tsquery(config, query)
+    candidate_limit = get_config().SEARCH_CANDIDATE_LIMIT
+
+    newest_first = (Note.date.desc(), Note.id.desc())
+    # One match past the limit, to tell whether any were left out. Used twice, so Postgres
+    # scans for candidates once
+    candidates = (
+        select(Note.id, Note.search_vector, func.row_number().over(order_by=newest_first).label("position"))
+        .where(Note.user_id == user_id, LIVE_NOTE, Note.search_vector.op("@@")(ts_query))
+        .order_by(*newest_first)
+        .limit(candidate_limit + 1)
+        .cte("candidates")
+    )
+    truncated = (
+        select(func.count() > candidate_limit).select_from(candidates).scalar_subquery().label("truncated")
+    )
+    rank = func.ts_rank_cd(candidates.c.search_vector, ts_query)
+    ranked = (
+        select(candidates.c.id, rank.label("rank"))
+        .where(candidates.c.position <= candidate_limit)
+        .order_by(rank.desc(), candidates.c.id.desc())
+        .limit(limit + 1)  # One extra row tells whether there is a next page
+    )
+    if after is not None:
+        after_rank, after_id = after
+        ranked = ranked.where(tuple_(rank, candidates.c.id) < tuple_(after_rank, after_id))
+    ranked = ranked.subquery()
+
+    # The best plan depends on how common the terms are (GIN for rare ones, the date index
+    # for common ones). asyncpg prepares statements, and a generic plan would fix one choice
+    # for every query; plan each search for its own terms instead.
+    await db.execute(text("SET LOCAL plan_cache_mode = force_custom_plan"))
+    result = await db.execute(
+        select(
+            Note.id,
+            Note.date,
+            Note.title,
+            ranked.c.rank,
+            func.ts_headline(config, _without_selectors(Note.title), ts_query, TITLE_OPTIONS).label("title_highlight"),
+            func.ts_headline(config, _without_selectors(Note.content), ts_query, SNIPPET_OPTIONS).label("snippet"),
+            truncated,
+        )
+        .join(ranked, ranked.c.id == Note.id)
+        .order_by(ranked.c.rank.desc(), Note.id.desc())
+    )
+    rows = result.all()
+    # An empty page (a cursor past the last result) cannot tell; earlier pages did
+    is_truncated = bool(rows) and rows[0].truncated
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+
+    results = [
+        {
+            "id": row.id,
+            "date": row.date,
+            "title": row.title,
+            "title_highlight": highlight(row.title_highlight),
+            "snippet": highlight(row.snippet),
+            "rank": row.rank,
+        }
+        for row in rows
+    ]
+    return results, next_cursor, is_truncated
@@ -0,0 +1,123 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db.models import Attachment, Note
+from app.services import attachment_storage as storage
+from app.services.note_counts import NoteCountDeltas
+
+logger = logging.getLogger(__name__)
+
+# Notes shown to the user: not in the trash and not archived. Written as NOT <column> so
+# Postgres can match it to the partial indexes' predicate (NOT is_deleted AND NOT is_archived)
+LIVE_NOTE = (~Note.is_deleted) & (~Note.is_archived)
+
+STATE_COLUMNS = (Note.id, Note.date, Note.category_id, Note.is_deleted, Note.deleted_at, Note.is_archived)
+
+
+def _utcnow() -> datetime:
+    # Timestamps are stored as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _state(row) -> dict:
+    return {"id": row.id, "is_deleted": row.is_deleted, "deleted_at": row.deleted_at, "is_archived": row.is_archived}
+
+
+async def _set_flag(db: AsyncSession, user_id: int, note_id: str, flag: str, value: bool, *conditions, **values) -> Optional[dict]:
+    """Set is_deleted or is_archived on one of the user's notes and adjust the daily counts; the caller commits.
+
+    The UPDATE only matches a note whose flag differs (and that meets `conditions`), so of
+    two concurrent requests only one changes the state and the counts. Returns the note's
+    state afterwards, or None if the user has no such note; a note that did not match is
+    returned unchanged.
+    """
+    column = getattr(Note, flag)
+    result = await db.execute(
+        update(Note)
+        .where(Note.id == note_id, Note.user_id == user_id, ~column if value else column, *conditions)
+        .values({flag: value, "updated_at": func.now(), **values})
+        .returning(*STATE_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    if row is None:
+        result = await db.execute(select(*STATE_COLUMNS).where(Note.id == note_id, Note.user_id == user_id))
+        row = result.one_or_none()
+        return _state(row) if row is not None else None
+
+    state = _state(row)
+    before = {**state, flag: not value}
+    live_before = not before["is_deleted"] and not before["is_archived"]
+    live_after = not state["is_deleted"] and not state["is_archived"]
+    if live_after != live_before:
+        count_deltas = NoteCountDeltas(user_id)
+        count_deltas.add(row.date, row.category_id, 1 if live_after else -1)
+        await count_deltas.apply(db)
+    return state
+
+
+async def move_to_trash(db: AsyncSession, user_id: int, note_id: str) -> Optional[dict]:
+    return await _set_flag(db, user_id, note_id, "is_deleted", True, deleted_at=func.now())
+
+
+async def restore_from_trash(db: AsyncSession, user_id: int, note_id: str) -> Optional[dict]:
+    # An archived note goes back to the archive
+    return await _set_flag(db, user_id, note_id, "is_deleted", False, deleted_at=None)
+
+
+async def archive_note(db: AsyncSession, user_id: int, note_id: str) -> Optional[dict]:
+    return await _set_flag(db, user_id, note_id, "is_archived", True, ~Note.is_deleted)
+
+
+async def unarchive_note(db: AsyncSession, user_id: int, note_id: str) -> Optional[dict]:
+    return await _set_flag(db, user_id, note_id, "is_archived", False, ~Note.is_deleted)
+
+
+def purge_trash(db: Session, older_than: timedelta, batch_size: int, max_batches: Optional[int] = None,
+                lock_timeout_ms: int = 1000) -> int:
+    """Hard-delete notes that have been in the trash longer than `older_than`. Returns notes deleted.
+
+    Works in batches of `batch_size`, one short transaction each, so no user's notes stay
+    locked for long. Notes locked by a request are skipped (SKIP LOCKED) and picked up by
+    a later run, and lock_timeout stops a batch that would wait on other rows (the
+    attachments removed with the notes) instead of queueing behind a user's transaction.
+    Trashed notes are already out of note_daily_counts, so no counts change.
+
+    The notes' attachment files (and thumbnails) are deleted from S3 once their batch has
+    committed; if that fails they are only orphaned, never referenced by a missing row.
+    """
+    cutoff = _utcnow() - older_than
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        expired = (
+            select(Note.id)
+            .where(Note.is_deleted, Note.deleted_at < cutoff)  # idx_note_trash
+            .order_by(Note.deleted_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        try:
+            db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            note_ids = db.execute(expired).scalars().all()
+            # Deleted here rather than by the cascade, to learn which objects to remove
+            files = db.execute(
+                delete(Attachment)
+                .where(Attachment.note_id.in_(note_ids))
+                .returning(Attachment.storage_key, Attachment.thumbnail_key)
+            ).all()
+            result = db.execute(delete(Note).where(Note.id.in_(note_ids)))
+            db.commit()
+        except OperationalError as e:
+            db.rollback()
+            logger.warning("Trash purge stopped after %s notes, a batch hit lock_timeout: %s", total, e.orig)
+            break
+        storage.discard_objects([key for row in files for key in row])
+        total += result.rowcount
+        batches += 1
+        if result.rowcount < batch_size:
+            break
+    return total
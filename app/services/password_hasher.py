@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from app.core.config import get_config
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_PROCESS = "process"
+EXECUTOR_THREAD = "thread"
+
+# Created on first use in whichever process runs the hash (API process or pool worker)
+_pwd_context: Optional[CryptContext] = None
+
+
+def get_pwd_context() -> CryptContext:
+    """The process's bcrypt context, created on first use."""
+    global _pwd_context
+    if _pwd_context is None:
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt hash/verify off the event loop with a hard limit on concurrent work.
+
+    At most `max_concurrency` hashes run at once, in a process pool by default so they
+    use every core without holding the GIL or the request threadpool. Up to `max_queue`
+    further callers may wait, each for at most `queue_timeout` seconds; beyond that the
+    request is shed with 503 and Retry-After so a login burst cannot starve note reads.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, executor_kind: str):
+        if executor_kind not in (EXECUTOR_PROCESS, EXECUTOR_THREAD):
+            raise ValueError(f"Invalid HASH_EXECUTOR '{executor_kind}'. Expected '{EXECUTOR_PROCESS}' or '{EXECUTOR_THREAD}'")
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.executor_kind = executor_kind
+        self.rejected = 0
+        self._pending = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_config(cls, config=None) -> "PasswordHasher":
+        config = config or get_config()
+        return cls(
+            max_concurrency=config.HASH_MAX_CONCURRENCY,
+            max_queue=config.HASH_MAX_QUEUE,
+            queue_timeout=config.HASH_QUEUE_TIMEOUT_SECONDS,
+            executor_kind=config.HASH_EXECUTOR,
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == EXECUTOR_PROCESS:
+                # spawn: forking a process that already runs event loop and pool threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="password-hasher")
+        return self._executor
+
+    def _overloaded(self) -> HTTPException:
+        self.rejected += 1
+        logger.warning("Password hashing overloaded: %s pending, rejecting request", self._pending)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_concurrency + self.max_queue:
+            raise self._overloaded()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self._pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._overloaded()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+            finally:
+                self._semaphore.release()
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with bcrypt."""
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Check a password against a bcrypt hash."""
+        return await self._run(_verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"pending": self._pending, "rejected": self.rejected, "max_concurrency": self.max_concurrency}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher.from_config()
@@ -0,0 +1,193 @@
+"""Token-bucket rate limits for the unauthenticated auth endpoints.
+
+Login, registration and password-reset requests each cost a bcrypt hash or an email, so
+a burst of them is throttled per client IP and per account (the email in the request;
+for logins, the email together with the client IP) before any database lookup or hash. A request over either limit gets 429 with
+Retry-After.
+
+A bucket holds up to `capacity` tokens and refills at capacity/period tokens a second;
+each request takes one. Buckets live in a backend. InMemoryBackend keeps them in this
+process, which on Lambda means per container: a client whose requests land on several
+containers gets each container's allowance. A backend shared by all processes (Redis,
+DynamoDB) implements RateLimitBackend.acquire, updating the bucket atomically on its
+side, and is installed with rate_limiter.set_backend().
+"""
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from fastapi import HTTPException, Request, status
+from app.core.config import get_config
+from app.core.metrics import record_rate_limited
+
+logger = logging.getLogger(__name__)
+
+SCOPE_IP = "ip"
+SCOPE_ACCOUNT = "account"
+# Actions whose account limit is kept per client IP. A login bucket shared by every client
+# would let anyone who knows an address lock its owner out with failed attempts; per
+# (account, IP) it still slows down guessing, and the owner's IP keeps its own allowance.
+# Registration and reset stay per account: their limit protects the inbox, not a password.
+PER_CLIENT_ACCOUNT_ACTIONS = frozenset({"login"})
+
+
+class Rate(NamedTuple):
+    capacity: int  # Requests allowed in a burst
+    period: float  # Seconds for an empty bucket to fill up again
+
+
+def parse_rate(value: str) -> Optional[Rate]:
+    """ "<requests>/<seconds>", e.g. "10/60"; an empty value or 0 requests means no limit."""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        capacity, period = value.split("/")
+        rate = Rate(int(capacity), float(period))
+    except ValueError:
+        raise ValueError(f"Invalid rate limit '{value}'. Expected '<requests>/<seconds>', e.g. '10/60'")
+    if rate.capacity <= 0:
+        return None
+    if rate.period <= 0:
+        raise ValueError(f"Invalid rate limit '{value}': the period must be positive")
+    return rate
+
+
+class RateLimitBackend(ABC):
+    """Where buckets are kept."""
+
+    @abstractmethod
+    async def acquire(self, key: str, rate: Rate) -> float:
+        """Take a token from `key`'s bucket. Returns 0 if one was taken, else the seconds until one is available."""
+
+
+class InMemoryBackend(RateLimitBackend):
+    """Buckets in a dict in this process, at most `max_keys` of them (least recently used dropped first).
+
+    Dropping a bucket only forgets how much of its allowance a client has used, and the
+    least recently used ones have mostly refilled anyway.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max(1, max_keys)
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()  # key -> (tokens, as of)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: Rate, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        refill_per_second = rate.capacity / rate.period
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (rate.capacity, now))
+            tokens = min(rate.capacity, tokens + (now - updated) * refill_per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def acquire(self, key: str, rate: Rate) -> float:
+        return self.take(key, rate)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    """Per-IP and per-account limits for each throttled action ("login", "register", "reset_password")."""
+
+    def __init__(self, rates: dict[str, dict[str, Optional[Rate]]], max_keys: int, trusted_proxies: int = 0, enabled: bool = True):
+        self.rates = rates
+        self.max_keys = max_keys
+        self.trusted_proxies = max(0, trusted_proxies)
+        self.enabled = enabled
+        self.rejected = 0
+        self._backend: Optional[RateLimitBackend] = None
+
+    @classmethod
+    def from_config(cls, config=None) -> "RateLimiter":
+        config = config or get_config()
+        return cls(
+            rates={
+                "login": {
+                    SCOPE_IP: parse_rate(config.RATE_LIMIT_LOGIN_PER_IP),
+                    SCOPE_ACCOUNT: parse_rate(config.RATE_LIMIT_LOGIN_PER_ACCOUNT),
+                },
+                "register": {
+                    SCOPE_IP: parse_rate(config.RATE_LIMIT_REGISTER_PER_IP),
+                    SCOPE_ACCOUNT: parse_rate(config.RATE_LIMIT_REGISTER_PER_ACCOUNT),
+                },
+                "reset_password": {
+                    SCOPE_IP: parse_rate(config.RATE_LIMIT_RESET_PER_IP),
+                    SCOPE_ACCOUNT: parse_rate(config.RATE_LIMIT_RESET_PER_ACCOUNT),
+                },
+            },
+            max_keys=config.RATE_LIMIT_MAX_KEYS,
+            trusted_proxies=config.RATE_LIMIT_TRUSTED_PROXIES,
+            enabled=config.RATE_LIMIT_ENABLED,
+        )
+
+    def get_backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = InMemoryBackend(self.max_keys)
+        return self._backend
+
+    def set_backend(self, backend: RateLimitBackend) -> None:
+        self._backend = backend
+
+    def client_ip(self, request: Request) -> str:
+        """The client's address. Behind `trusted_proxies` proxies, the address the outermost one saw.
+
+        Only entries appended by our own proxies count: anything further left in
+        X-Forwarded-For was sent by the client and could be anything.
+        """
+        if self.trusted_proxies:
+            forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",") if address.strip()]
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        return request.client.host if request.client else "unknown"
+
+    async def check(self, request: Request, action: str, account: str) -> None:
+        """Take a token from the client IP's and the account's bucket for `action`, or raise 429.
+
+        The IP is checked first; a request it rejects does not count against the account,
+        so one noisy client cannot use up another user's allowance as quickly.
+        """
+        if not self.enabled:
+            return
+        ip = self.client_ip(request)
+        account = account.strip().lower()
+        if action in PER_CLIENT_ACCOUNT_ACTIONS:
+            account = f"{account} from {ip}"
+        keys = ((SCOPE_IP, ip), (SCOPE_ACCOUNT, account))
+        for scope, value in keys:
+            rate = self.rates[action][scope]
+            if rate is None:
+                continue
+            wait = await self.get_backend().acquire(f"{action}:{scope}:{value}", rate)
+            if wait > 0:
+                raise self._rejected(action, scope, value, wait)
+
+    def _rejected(self, action: str, scope: str, value: str, wait: float) -> HTTPException:
+        self.rejected += 1
+        record_rate_limited(action, scope)
+        logger.warning("Rate limited %s by %s %s, retry in %.0fs", action, scope, value, wait)
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+    def stats(self) -> dict:
+        return {"rejected": self.rejected, "enabled": self.enabled}
+
+
+rate_limiter = RateLimiter.from_config()
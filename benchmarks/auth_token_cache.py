@@ -0,0 +1,61 @@
+"""Per-request auth overhead of get_current_user, with and without the verified-token cache.
+
+The identity cache is warmed first so no database round trip is measured; what is left
+is the work get_current_user does for every request: verifying the bearer token.
+
+    python -m benchmarks.auth_token_cache --iterations 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app import security
+from app.core.cache import TTLCache
+from app.schemas.users import UserResponse
+
+
+async def _measure(token: str, iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await security.get_current_user(token, db=None)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return timings
+
+
+def _summary(label: str, timings: list[float]) -> str:
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    return f"{label:<16} mean={statistics.fmean(timings):8.2f}us  p50={p50:8.2f}us  p99={p99:8.2f}us"
+
+
+async def main(iterations: int):
+    email = "bench@example.com"
+    token = security.create_access_token(data={"sub": email})
+    security.identity_cache.set(
+        email,
+        UserResponse(id=1, user_ulid="0" * 26, email=email, first_name="Bench", last_name="User", is_active=True),
+        ttl=3600,
+    )
+
+    token_cache = security.token_cache
+    security.token_cache = TTLCache(maxsize=0, ttl=0)  # disabled: every call verifies the token
+    uncached = await _measure(token, iterations)
+
+    security.token_cache = token_cache
+    await security.get_current_user(token, db=None)  # warm
+    cached = await _measure(token, iterations)
+
+    print(f"get_current_user, {iterations} iterations (identity cache warm)")
+    print(_summary("without cache", uncached))
+    print(_summary("with cache", cached))
+    print(f"speedup          {statistics.fmean(uncached) / statistics.fmean(cached):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
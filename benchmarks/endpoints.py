@@ -0,0 +1,369 @@
+"""Latency and throughput of the main API endpoints against seeded data.
+
+Requests go through the ASGI app in-process (no server, no sockets) at a fixed concurrency,
+against the PostgreSQL database configured by the usual DB_* variables. Seeding is
+deterministic for a given --seed, so runs on the same machine can be compared with a
+saved JSON baseline.
+
+    python -m benchmarks.endpoints seed --users 5 --days 60 --notes-per-day 10 --categories 6
+    python -m benchmarks.endpoints run --concurrency 10 --requests 300 --save benchmarks/baseline.json
+    python -m benchmarks.endpoints run --compare benchmarks/baseline.json --tolerance 0.2
+
+`seed` deletes and recreates the bench-*@example.com users only. Notes created by the
+create-or-update-note scenario land after the seeded days, so reads are not affected;
+re-seed to drop them.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple
+from urllib.parse import urlencode
+
+EMAIL_PATTERN = "bench-{}@example.com"
+PASSWORD = "bench-password"
+FIRST_DAY = date(2025, 1, 1)
+WORDS = (
+    "meeting notes review deploy release design sync planning retro standup bug fix "
+    "customer call draft budget report roadmap hiring onboarding incident metrics"
+).split()
+SCENARIOS = ("login", "create-or-update-note", "get-all-notes", "get-all-notes-count", "categories")
+
+
+class Response(NamedTuple):
+    status: int
+    body: bytes
+
+
+async def asgi_request(app, method: str, path: str, query: dict = None, headers: dict = None, body: bytes = b"") -> Response:
+    """One HTTP request straight into the ASGI app."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": urlencode(query or {}).encode(),
+        "headers": [(b"host", b"bench")] + [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    status, chunks = 0, []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                response_done.set()
+
+    await app(scope, receive, send)
+    return Response(status, b"".join(chunks))
+
+
+# ---------------------------------------------------------------- seeding
+
+async def seed(users: int, days: int, notes_per_day: int, categories: int, seed_value: int) -> None:
+    from sqlalchemy import delete, func, insert, select
+    from app.db.database import get_async_sessionmaker
+    from app.db.models import Category, Color, Note, NoteDailyCount, User
+    from app.services.note_ordering import ORDER_GAP
+    from app.services.password_hasher import get_pwd_context
+    import ulid
+
+    rng = random.Random(seed_value)
+    password_hash = get_pwd_context().hash(PASSWORD)
+    async with get_async_sessionmaker()() as db:
+        # Notes, categories and counts go with the users (ON DELETE CASCADE)
+        await db.execute(delete(User).where(User.email.like(EMAIL_PATTERN.format("%"))))
+        if not await db.scalar(select(func.count()).select_from(Color)):
+            await db.execute(insert(Color), [{"color": color} for color in ("#FF0000", "#00FF00", "#0000FF")])
+        color_ids = (await db.execute(select(Color.id).order_by(Color.id))).scalars().all()
+
+        for user_number in range(users):
+            user_id = await db.scalar(
+                insert(User)
+                .values(
+                    email=EMAIL_PATTERN.format(user_number), first_name="Bench", last_name=f"User {user_number}",
+                    password_hash=password_hash, is_active=True, is_verified=True,
+                )
+                .returning(User.id)
+            )
+            category_ids = [ulid.new().str for _ in range(categories)]
+            await db.execute(insert(Category), [
+                {"id": category_id, "user_id": user_id, "name": f"Category {number}", "color_id": rng.choice(color_ids)}
+                for number, category_id in enumerate(category_ids)
+            ])
+
+            notes, counts = [], Counter()
+            for day_number in range(days):
+                day = FIRST_DAY + timedelta(days=day_number)
+                for position in range(notes_per_day):
+                    category_id = rng.choice(category_ids)
+                    notes.append({
+                        "id": ulid.new().str,
+                        "user_id": user_id,
+                        "title": " ".join(rng.choices(WORDS, k=4)).capitalize(),
+                        "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 120))),
+                        "date": datetime.combine(day, datetime.min.time()) + timedelta(minutes=position),
+                        "category_id": category_id,
+                        "order_index": (position + 1) * ORDER_GAP,
+                        "pinned": False,
+                        "is_deleted": False,
+                        "is_archived": False,
+                    })
+                    counts[day, category_id] += 1
+            for start in range(0, len(notes), 5000):
+                await db.execute(insert(Note), notes[start:start + 5000])
+            if counts:
+                await db.execute(insert(NoteDailyCount), [
+                    {"user_id": user_id, "day": day, "category_id": category_id, "count": count}
+                    for (day, category_id), count in counts.items()
+                ])
+        await db.commit()
+    print(f"Seeded {users} users x {days} days x {notes_per_day} notes ({users * days * notes_per_day} notes), {categories} categories each")
+
+
+# ---------------------------------------------------------------- scenarios
+
+class Context(NamedTuple):
+    app: object
+    rng: random.Random
+    tokens: list[str]
+    days: int
+
+
+def _authorization(context: Context) -> dict:
+    return {"Authorization": f"Bearer {context.rng.choice(context.tokens)}"}
+
+
+def _login(context: Context) -> Awaitable[Response]:
+    user_number = context.rng.randrange(len(context.tokens))
+    form = urlencode({"username": EMAIL_PATTERN.format(user_number), "password": PASSWORD}).encode()
+    return asgi_request(
+        context.app, "POST", "/v1/auth/login",
+        headers={"Content-Type": "application/x-www-form-urlencoded"}, body=form,
+    )
+
+
+def _create_note(context: Context) -> Awaitable[Response]:
+    # After the seeded days, so the read scenarios see the same data on every run
+    day = FIRST_DAY + timedelta(days=context.days + context.rng.randrange(30))
+    payload = {
+        "title": " ".join(context.rng.choices(WORDS, k=4)),
+        "content": " ".join(context.rng.choices(WORDS, k=40)),
+        "date": datetime.combine(day, datetime.min.time()).isoformat(),
+        "category_name": f"Category {context.rng.randrange(3)}",
+    }
+    return asgi_request(
+        context.app, "POST", "/v1/notes/create-or-update-note",
+        headers={**_authorization(context), "Content-Type": "application/json"}, body=json.dumps(payload).encode(),
+    )
+
+
+def _get_notes(context: Context) -> Awaitable[Response]:
+    day = FIRST_DAY + timedelta(days=context.rng.randrange(context.days))
+    return asgi_request(context.app, "GET", "/v1/notes/get-all-notes", query={"date": day.isoformat()}, headers=_authorization(context))
+
+
+def _get_notes_count(context: Context) -> Awaitable[Response]:
+    day = FIRST_DAY + timedelta(days=context.rng.randrange(context.days))
+    return asgi_request(
+        context.app, "POST", "/v1/notes/get-all-notes-count",
+        headers={**_authorization(context), "Content-Type": "application/json"},
+        body=json.dumps({"month": day.month, "year": day.year}).encode(),
+    )
+
+
+def _get_categories(context: Context) -> Awaitable[Response]:
+    return asgi_request(context.app, "GET", "/v1/notes/categories", headers=_authorization(context))
+
+
+REQUESTS: dict[str, Callable[[Context], Awaitable[Response]]] = {
+    "login": _login,
+    "create-or-update-note": _create_note,
+    "get-all-notes": _get_notes,
+    "get-all-notes-count": _get_notes_count,
+    "categories": _get_categories,
+}
+
+
+async def _drive(context: Context, make_request, requests: int, concurrency: int) -> tuple[list[float], Counter, float]:
+    """Send `requests` requests from `concurrency` workers; returns (latencies ms, status counts, seconds)."""
+    latencies, statuses = [], Counter()
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await make_request(context)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def _summarize(latencies: list[float], statuses: Counter, elapsed: float) -> dict:
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def run(args) -> dict:
+    from sqlalchemy import select
+    from app.db.database import get_async_sessionmaker
+    from app.db.models import User
+    from app.main import app
+    from app.security import create_access_token
+    from app.services.password_hasher import password_hasher
+    from app.services.rate_limiter import rate_limiter
+
+    logging.disable(logging.INFO)  # Per-request route logging would dominate the timings
+    rate_limiter.enabled = False  # Every request comes from one address: the login scenario would measure 429s
+    async with get_async_sessionmaker()() as db:
+        emails = (await db.execute(
+            select(User.email).where(User.email.like(EMAIL_PATTERN.format("%"))).order_by(User.id)
+        )).scalars().all()
+    if not emails:
+        raise SystemExit("No benchmark users found, run `python -m benchmarks.endpoints seed` first")
+
+    context = Context(app, random.Random(args.seed), [create_access_token({"sub": email}) for email in emails], args.days)
+    results = {}
+    try:
+        for name in args.scenarios:
+            make_request = REQUESTS[name]
+            # bcrypt makes every login cost hundreds of milliseconds of CPU on purpose
+            requests = args.login_requests if name == "login" else args.requests
+            await _drive(context, make_request, min(args.warmup, requests), args.concurrency)
+            results[name] = _summarize(*await _drive(context, make_request, requests, args.concurrency))
+            print(_format(name, results[name]))
+    finally:
+        password_hasher.shutdown()
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "users": len(emails),
+        },
+        "results": results,
+    }
+
+
+def _format(name: str, result: dict) -> str:
+    errors = f"  errors={result['errors']} {result['statuses']}" if result["errors"] else ""
+    return (
+        f"{name:<22} p50={result['p50_ms']:8.2f}ms  p95={result['p95_ms']:8.2f}ms  p99={result['p99_ms']:8.2f}ms"
+        f"  {result['throughput_rps']:8.1f} req/s{errors}"
+    )
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against a baseline report: p50 more than `tolerance` slower, or throughput that much lower.
+
+    Tail latencies are shown but not judged; over a few hundred requests they are too noisy.
+    """
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['meta']['created_at']} (tolerance {tolerance:.0%}):")
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        changes = {
+            "p50_ms": result["p50_ms"] / before["p50_ms"] - 1,
+            "p95_ms": result["p95_ms"] / before["p95_ms"] - 1,
+            "throughput_rps": 1 - result["throughput_rps"] / before["throughput_rps"],  # Positive = worse
+        }
+        worse = [metric for metric in ("p50_ms", "throughput_rps") if changes[metric] > tolerance]
+        print(
+            f"{name:<22} p50 {changes['p50_ms']:+7.1%}  p95 {changes['p95_ms']:+7.1%}"
+            f"  throughput {-changes['throughput_rps']:+7.1%}  {'REGRESSION' if worse else 'ok'}"
+        )
+        regressions.extend(f"{name} {metric}" for metric in worse)
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name} errors")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seeder = commands.add_parser("seed", help="Recreate the benchmark users and their notes")
+    seeder.add_argument("--users", type=int, default=5)
+    seeder.add_argument("--days", type=int, default=60, help="Days with notes, starting at 2025-01-01")
+    seeder.add_argument("--notes-per-day", type=int, default=10)
+    seeder.add_argument("--categories", type=int, default=6, help="Categories per user")
+    seeder.add_argument("--seed", type=int, default=42)
+
+    runner = commands.add_parser("run", help="Benchmark the endpoints against the seeded data")
+    runner.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    runner.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once")
+    runner.add_argument("--requests", type=int, default=300, help="Measured requests per scenario")
+    runner.add_argument("--login-requests", type=int, default=40, help="Measured requests for the login scenario")
+    runner.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario first")
+    runner.add_argument("--days", type=int, default=60, help="Must match the seeded --days")
+    runner.add_argument("--seed", type=int, default=42)
+    runner.add_argument("--save", default=None, help="Write the results to this JSON file (a new baseline)")
+    runner.add_argument("--compare", default=None, help="Baseline JSON to compare with; exits 1 on a regression")
+    runner.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a regression is reported")
+
+    args = parser.parse_args(argv)
+    if args.command == "seed":
+        asyncio.run(seed(args.users, args.days, args.notes_per_day, args.categories, args.seed))
+        return 0
+
+    report = asyncio.run(run(args))
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(report, json.load(baseline), args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
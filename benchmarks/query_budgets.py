@@ -0,0 +1,300 @@
+"""Check every /v1 endpoint against the SQL statement budget declared with @query_budget.
+
+Each route is called once through the ASGI app with a sample request, with the identity
+and category caches cleared first, so the count is the cold-cache worst case. A route
+over budget is reported with the lazy loads that caused it; a route without a budget or
+without a sample request here fails too, so new endpoints cannot skip the check.
+
+Needs the benchmark data (`python -m benchmarks.endpoints seed`). The attachment routes
+also need ATTACHMENT_BUCKET (and S3_ENDPOINT_URL for a local stand-in); without it they
+are reported as skipped.
+
+    python -m benchmarks.query_budgets
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import timedelta
+from typing import Awaitable, Callable
+from urllib.parse import urlencode
+
+from benchmarks.endpoints import EMAIL_PATTERN, FIRST_DAY, PASSWORD, asgi_request
+
+REGISTER_EMAIL_PATTERN = "query-budget-{}@example.com"
+NEW_NOTE_DAY = FIRST_DAY - timedelta(days=1)  # Outside the seeded days the endpoint benchmark reads
+ATTACHMENT_BODY = b"query budget check"
+
+Sample = Callable[[dict], Awaitable[dict]]
+SAMPLES: dict[tuple[str, str], Sample] = {}
+
+
+class SkipSample(Exception):
+    """The route cannot be sampled in this environment; the message says why."""
+
+
+def sample(method: str, path: str):
+    def register(build: Sample) -> Sample:
+        SAMPLES[method, path] = build
+        return build
+    return register
+
+
+def _json(payload) -> dict:
+    return {"headers": {"Content-Type": "application/json"}, "body": json.dumps(payload).encode()}
+
+
+def _note(title: str, category: str) -> dict:
+    return {"title": title, "content": "query budget check", "date": f"{NEW_NOTE_DAY.isoformat()}T09:00:00", "category_name": category}
+
+
+# ---------------------------------------------------------------- auth
+
+@sample("POST", "/v1/auth/register")
+async def _register(state):
+    return _json({
+        "first_name": "Query", "last_name": "Budget", "email": state["new_email"], "password": "Budget@Passw0rd1",
+    })
+
+
+@sample("GET", "/v1/auth/confirm-email")
+async def _confirm_email(state):
+    from app.routes.auth import create_confirmation_token
+
+    return {"query": {"token": create_confirmation_token(state["new_email"])}}
+
+
+@sample("POST", "/v1/auth/reset-password/request")
+async def _reset_request(state):
+    return _json({"email": state["new_email"]})
+
+
+@sample("POST", "/v1/auth/reset-password")
+async def _reset_password(state):
+    from app.security import create_reset_token
+
+    return _json({"token": create_reset_token(state["new_email"]), "new_password": "Budget@Passw0rd2"})
+
+
+@sample("POST", "/v1/auth/login")
+async def _login(state):
+    form = urlencode({"username": EMAIL_PATTERN.format(0), "password": PASSWORD}).encode()
+    return {"headers": {"Content-Type": "application/x-www-form-urlencoded"}, "body": form}
+
+
+@sample("GET", "/v1/auth/test-db")
+async def _test_db(state):
+    return {}
+
+
+# ---------------------------------------------------------------- notes
+
+@sample("POST", "/v1/notes/create-or-update-note")
+async def _create_note(state):
+    return _json(_note("Budget check", "Category 0"))
+
+
+@sample("POST", "/v1/notes/bulk-upsert")
+async def _bulk_upsert(state):
+    return _json({"notes": [_note(f"Budget bulk {number}", f"Category {number}") for number in range(3)]})
+
+
+@sample("PUT", "/v1/notes/reorder")
+async def _reorder(state):
+    response = await asgi_request(
+        state["app"], "GET", "/v1/notes/get-all-notes", query={"date": FIRST_DAY.isoformat()}, headers=state["auth"],
+    )
+    note_ids = [note["id"] for note in json.loads(response.body)["data"]["notes"]]
+    return _json({"date": FIRST_DAY.isoformat(), "note_ids": note_ids[::-1]})
+
+
+@sample("DELETE", "/v1/notes/{note_id}")
+async def _delete_note(state):
+    # The note is created here, outside the counted request, and reused by the samples below
+    request = _json(_note("Budget trash", "Category 0"))
+    response = await asgi_request(
+        state["app"], "POST", "/v1/notes/create-or-update-note",
+        headers={**state["auth"], **request["headers"]}, body=request["body"],
+    )
+    state["note_id"] = json.loads(response.body)["data"]["id"]
+    return {"path": f"/v1/notes/{state['note_id']}"}
+
+
+@sample("POST", "/v1/notes/{note_id}/restore")
+async def _restore_note(state):
+    return {"path": f"/v1/notes/{state['note_id']}/restore"}
+
+
+@sample("POST", "/v1/notes/{note_id}/archive")
+async def _archive_note(state):
+    return {"path": f"/v1/notes/{state['note_id']}/archive"}
+
+
+@sample("POST", "/v1/notes/{note_id}/unarchive")
+async def _unarchive_note(state):
+    return {"path": f"/v1/notes/{state['note_id']}/unarchive"}
+
+
+def _require_attachment_storage() -> None:
+    from app.core.config import get_config
+
+    if not get_config().ATTACHMENT_BUCKET:
+        raise SkipSample("ATTACHMENT_BUCKET is not set")
+
+
+@sample("POST", "/v1/notes/{note_id}/attachments")
+async def _start_upload(state):
+    _require_attachment_storage()
+    payload = {"file_name": "budget.txt", "file_type": "text/plain", "file_size": len(ATTACHMENT_BODY)}
+    return {**_json(payload), "path": f"/v1/notes/{state['note_id']}/attachments"}
+
+
+@sample("POST", "/v1/notes/{note_id}/attachments/{attachment_id}/complete")
+async def _complete_upload(state):
+    import requests
+
+    _require_attachment_storage()
+    upload = state["upload"]
+    requests.put(upload["url"], data=ATTACHMENT_BODY, headers=upload["headers"], timeout=10).raise_for_status()
+    return {"path": f"/v1/notes/{state['note_id']}/attachments/{upload['attachment_id']}/complete"}
+
+
+@sample("GET", "/v1/notes/{note_id}/attachments/{attachment_id}")
+async def _attachment_download(state):
+    _require_attachment_storage()
+    return {"path": f"/v1/notes/{state['note_id']}/attachments/{state['upload']['attachment_id']}"}
+
+
+@sample("GET", "/v1/notes/get-all-notes")
+async def _get_notes(state):
+    return {"query": {"date": FIRST_DAY.isoformat()}}
+
+
+@sample("POST", "/v1/notes/get-all-notes-count")
+async def _get_notes_count(state):
+    return _json({"month": FIRST_DAY.month, "year": FIRST_DAY.year})
+
+
+@sample("GET", "/v1/notes/search")
+async def _search(state):
+    return {"query": {"q": "meeting"}}
+
+
+@sample("GET", "/v1/notes/export")
+async def _export(state):
+    return {"query": {"format": "ndjson", "from": FIRST_DAY.isoformat(), "to": (FIRST_DAY + timedelta(days=6)).isoformat()}}
+
+
+@sample("POST", "/v1/notes/import")
+async def _import(state):
+    lines = [json.dumps(_note(f"Budget import {number}", "Category 0")) for number in range(3)]
+    return {"query": {"format": "ndjson"}, "body": "\n".join(lines).encode()}
+
+
+@sample("GET", "/v1/notes/import/{job_id}")
+async def _import_job(state):
+    return {"path": f"/v1/notes/import/{state['import_job_id']}"}
+
+
+@sample("GET", "/v1/notes/categories")
+async def _categories(state):
+    return {}
+
+
+# ---------------------------------------------------------------- check
+
+async def _delete_registered_users() -> None:
+    from sqlalchemy import delete
+    from app.db.database import get_async_sessionmaker
+    from app.db.models import User
+
+    async with get_async_sessionmaker()() as db:
+        await db.execute(delete(User).where(User.email.like(REGISTER_EMAIL_PATTERN.format("%"))))
+        await db.commit()
+
+
+def _routes(app) -> list[tuple[str, str, object]]:
+    from fastapi.routing import APIRoute
+
+    return [
+        (method, route.path, route.endpoint)
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path.startswith("/v1/")
+        for method in sorted(route.methods)
+    ]
+
+
+async def check() -> list[str]:
+    import ulid
+    from app.db.query_counter import count_queries
+    from app.main import app
+    from app.security import create_access_token, identity_cache
+    from app.services.categories import category_cache
+    from app.services.password_hasher import password_hasher
+
+    logging.disable(logging.INFO)
+    await _delete_registered_users()
+    state = {
+        "app": app,
+        "auth": {"Authorization": f"Bearer {create_access_token({'sub': EMAIL_PATTERN.format(0)})}"},
+        "new_email": REGISTER_EMAIL_PATTERN.format(ulid.new().str.lower()),
+    }
+
+    failures = []
+    print(f"{'statements':>10} {'budget':>6}  route")
+    try:
+        # Samples run in declaration order (register before confirm-email, import before its job)
+        routes = {(method, path): endpoint for method, path, endpoint in _routes(app)}
+        for method, path in list(SAMPLES) + sorted(routes.keys() - SAMPLES.keys()):
+            label = f"{method} {path}"
+            endpoint = routes.get((method, path))
+            if endpoint is None:
+                continue  # A sample for a route that no longer exists
+            budget = getattr(endpoint, "__query_budget__", None)
+            if budget is None:
+                failures.append(f"{label}: no @query_budget declared")
+                continue
+            if (method, path) not in SAMPLES:
+                failures.append(f"{label}: no sample request in benchmarks/query_budgets.py")
+                continue
+
+            try:
+                request = await SAMPLES[method, path](state)
+            except SkipSample as e:
+                print(f"{'-':>10} {budget:>6}  {label}  skipped: {e}")
+                continue
+            headers = {**state["auth"], **request.get("headers", {})}
+            identity_cache.clear()
+            category_cache.clear()
+            with count_queries() as log:
+                response = await asgi_request(
+                    app, method, request.get("path", path), query=request.get("query"), headers=headers, body=request.get("body", b""),
+                )
+            if response.status >= 400:
+                failures.append(f"{label}: sample request failed with {response.status} {response.body[:200]!r}")
+                continue
+            if path == "/v1/notes/import":
+                state["import_job_id"] = json.loads(response.body)["data"]["id"]
+            elif path == "/v1/notes/{note_id}/attachments":
+                state["upload"] = json.loads(response.body)["data"]
+
+            print(f"{len(log):>10} {budget:>6}  {label}{'  OVER BUDGET' if len(log) > budget else ''}")
+            if len(log) > budget:
+                failures.append(log.describe(budget, label))
+    finally:
+        await _delete_registered_users()
+        password_hasher.shutdown()
+    return failures
+
+
+def main(argv=None) -> int:
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args(argv)
+    failures = asyncio.run(check())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Add import_jobs table for resumable bulk note imports
+
+Revision ID: 2c6e8a4f1b37
+Revises: 7a3d5c1e9b42
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6e8a4f1b37'
+down_revision: Union[str, None] = '7a3d5c1e9b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.String(length=26), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('source', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('rows_read', sa.Integer(), nullable=False),
+        sa.Column('rows_imported', sa.Integer(), nullable=False),
+        sa.Column('rows_rejected', sa.Integer(), nullable=False),
+        sa.Column('errors', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('finished_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('idx_import_job_user', 'import_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_import_job_user', table_name='import_jobs')
+    op.drop_table('import_jobs')
@@ -0,0 +1,41 @@
+"""Add composite (user_id, date, order_index) index on notes
+
+Revision ID: 3c9a1f6e2b7d
+Revises: f5f8051a9b3e
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1f6e2b7d'
+down_revision: Union[str, None] = 'f5f8051a9b3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so note writes are not blocked while the index is created
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_note_user_date_order',
+            'notes',
+            ['user_id', 'date', 'order_index'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_note_user_date_order',
+            table_name='notes',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,53 @@
+"""Spread notes.order_index into gap-based values per user and day
+
+Revision ID: 5e7c2a9f4d18
+Revises: b41f0c9d7e23
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7c2a9f4d18'
+down_revision: Union[str, None] = 'b41f0c9d7e23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ORDER_GAP = 1024
+
+
+def upgrade() -> None:
+    op.execute(
+        f"""
+        UPDATE notes SET order_index = ranked.position * {ORDER_GAP}
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id, CAST(date AS DATE)
+                ORDER BY order_index, id
+            ) AS position
+            FROM notes
+        ) ranked
+        WHERE notes.id = ranked.id
+        """
+    )
+
+
+def downgrade() -> None:
+    # Dense 0..n-1 indexes per user and day, as the previous scheme assigned them
+    op.execute(
+        """
+        UPDATE notes SET order_index = ranked.position - 1
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id, CAST(date AS DATE)
+                ORDER BY order_index, id
+            ) AS position
+            FROM notes
+        ) ranked
+        WHERE notes.id = ranked.id
+        """
+    )
@@ -0,0 +1,60 @@
+"""Add a generated tsvector column and GIN index for note full-text search
+
+Revision ID: 7a3d5c1e9b42
+Revises: 5e7c2a9f4d18
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3d5c1e9b42'
+down_revision: Union[str, None] = '5e7c2a9f4d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match Note.search_vector; title matches rank above content matches
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    # A stored generated column is recomputed by Postgres on every insert/update of the
+    # row, so the index stays current without triggers. Adding it rewrites the table once.
+    op.add_column(
+        'notes',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+            nullable=True,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_note_search_vector',
+            'notes',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_note_search_vector',
+            table_name='notes',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('notes', 'search_vector')
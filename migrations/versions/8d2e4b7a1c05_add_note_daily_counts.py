@@ -0,0 +1,43 @@
+"""Add note_daily_counts summary table
+
+Revision ID: 8d2e4b7a1c05
+Revises: 3c9a1f6e2b7d
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4b7a1c05'
+down_revision: Union[str, None] = '3c9a1f6e2b7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'note_daily_counts',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.String(length=26), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day', 'category_id'),
+    )
+    # Initial backfill; `python -m app.cli backfill-note-counts` rebuilds it later if needed
+    op.execute(
+        """
+        INSERT INTO note_daily_counts (user_id, day, category_id, count)
+        SELECT user_id, CAST(date AS DATE), COALESCE(category_id, 'uncategorized'), COUNT(*)
+        FROM notes
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('note_daily_counts')
@@ -0,0 +1,49 @@
+"""Index leased (sending) email_outbox rows with the pending ones
+
+Revision ID: a7d3e9b2c5f4
+Revises: f2a8c4e6b1d3
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9b2c5f4'
+down_revision: Union[str, None] = 'f2a8c4e6b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The worker now also claims sending rows whose lease ran out
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_email_outbox_due',
+            'email_outbox',
+            ['next_attempt_at'],
+            unique=False,
+            postgresql_where=sa.text("status IN ('pending', 'sending')"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index('idx_email_outbox_pending', table_name='email_outbox', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    # The old worker only picks up pending rows
+    op.execute("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_email_outbox_pending',
+            'email_outbox',
+            ['next_attempt_at'],
+            unique=False,
+            postgresql_where=sa.text("status = 'pending'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index('idx_email_outbox_due', table_name='email_outbox', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,71 @@
+"""Unique category name per user
+
+Revision ID: b41f0c9d7e23
+Revises: 8d2e4b7a1c05
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f0c9d7e23'
+down_revision: Union[str, None] = '8d2e4b7a1c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge duplicate (user_id, name) categories into the oldest one before adding the constraint
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE category_duplicates ON COMMIT DROP AS
+        SELECT c.id AS duplicate_id, keep.id AS keep_id
+        FROM categories c
+        JOIN LATERAL (
+            SELECT k.id FROM categories k
+            WHERE k.user_id = c.user_id AND k.name = c.name
+            ORDER BY k.numeric_id
+            LIMIT 1
+        ) keep ON keep.id <> c.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE notes SET category_id = d.keep_id
+        FROM category_duplicates d
+        WHERE notes.category_id = d.duplicate_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO note_daily_counts (user_id, day, category_id, count)
+        SELECT n.user_id, n.day, d.keep_id, n.count
+        FROM note_daily_counts n
+        JOIN category_duplicates d ON d.duplicate_id = n.category_id
+        ON CONFLICT (user_id, day, category_id)
+        DO UPDATE SET count = note_daily_counts.count + EXCLUDED.count
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM note_daily_counts n
+        USING category_duplicates d
+        WHERE n.category_id = d.duplicate_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM categories c
+        USING category_duplicates d
+        WHERE c.id = d.duplicate_id
+        """
+    )
+    op.create_unique_constraint('uq_category_user_name', 'categories', ['user_id', 'name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_category_user_name', 'categories', type_='unique')
@@ -0,0 +1,36 @@
+"""Index pending attachments by age for the abandoned-upload sweep
+
+Revision ID: b8e4f1a6d2c9
+Revises: a7d3e9b2c5f4
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4f1a6d2c9'
+down_revision: Union[str, None] = 'a7d3e9b2c5f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_attachment_pending',
+            'attachments',
+            ['created_at'],
+            unique=False,
+            postgresql_where=sa.text("status = 'pending'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_attachment_pending', table_name='attachments', postgresql_concurrently=True, if_exists=True)
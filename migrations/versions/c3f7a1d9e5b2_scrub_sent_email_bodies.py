@@ -0,0 +1,28 @@
+"""Clear the bodies of emails already sent or given up on
+
+Revision ID: c3f7a1d9e5b2
+Revises: b8e4f1a6d2c9
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f7a1d9e5b2'
+down_revision: Union[str, None] = 'b8e4f1a6d2c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The worker now clears html_content when it finishes with an email; do the same for
+    # rows it finished before, whose reset and verification links would otherwise stay
+    op.execute("UPDATE email_outbox SET html_content = '' WHERE status IN ('sent', 'failed') AND html_content <> ''")
+
+
+def downgrade() -> None:
+    # The cleared bodies are gone for good
+    pass
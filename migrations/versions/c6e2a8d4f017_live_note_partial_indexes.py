@@ -0,0 +1,110 @@
+"""Make note flags NOT NULL and index live notes with partial indexes
+
+Revision ID: c6e2a8d4f017
+Revises: 9f1b3d5a7c26
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e2a8d4f017'
+down_revision: Union[str, None] = '9f1b3d5a7c26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match LIVE_NOTE in app/services/note_trash.py; queries have to imply it for
+# Postgres to pick these indexes
+LIVE_NOTE_SQL = "NOT is_deleted AND NOT is_archived"
+
+# note_daily_counts counted every note until now; from here on it counts live notes only.
+# Same locking as backfill_note_counts in app/services/note_counts.py
+REBUILD_COUNTS_SQL = """
+INSERT INTO note_daily_counts (user_id, day, category_id, count)
+SELECT user_id, CAST(date AS DATE), COALESCE(category_id, 'uncategorized'), COUNT(*)
+FROM notes
+{where}
+GROUP BY 1, 2, 3
+"""
+
+
+def rebuild_note_counts(where: str) -> None:
+    op.execute("LOCK TABLE note_daily_counts IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("DELETE FROM note_daily_counts")
+    op.execute(REBUILD_COUNTS_SQL.format(where=where))
+
+
+def upgrade() -> None:
+    # NULL would fall outside both "live" and "trashed"; no code ever wrote NULL, but rows
+    # inserted outside the ORM may have. SET NOT NULL scans the table once under its lock.
+    for column in ('is_deleted', 'is_archived'):
+        op.execute(f"UPDATE notes SET {column} = false WHERE {column} IS NULL")
+        op.alter_column('notes', column, existing_type=sa.Boolean(), nullable=False, server_default=sa.text('false'))
+    # After the flag backfill, so notes that had NULL flags count as live
+    rebuild_note_counts(f"WHERE {LIVE_NOTE_SQL}")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_note_live_user_date_order',
+            'notes',
+            ['user_id', 'date', 'order_index'],
+            unique=False,
+            postgresql_where=sa.text(LIVE_NOTE_SQL),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'idx_note_live_search_vector',
+            'notes',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text(LIVE_NOTE_SQL),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'idx_note_trash',
+            'notes',
+            ['deleted_at'],
+            unique=False,
+            postgresql_where=sa.text('is_deleted'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # Replaced by the partial indexes above
+        op.drop_index('idx_note_user_date_order', table_name='notes', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('idx_note_search_vector', table_name='notes', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_note_user_date_order',
+            'notes',
+            ['user_id', 'date', 'order_index'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'idx_note_search_vector',
+            'notes',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index('idx_note_trash', table_name='notes', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('idx_note_live_search_vector', table_name='notes', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('idx_note_live_user_date_order', table_name='notes', postgresql_concurrently=True, if_exists=True)
+
+    for column in ('is_deleted', 'is_archived'):
+        op.alter_column('notes', column, existing_type=sa.Boolean(), nullable=True, server_default=None)
+    # Back to counting every note, as before this revision
+    rebuild_note_counts("")
@@ -0,0 +1,32 @@
+"""Track presigned attachment uploads
+
+Revision ID: e1f7b3c9a5d2
+Revises: c6e2a8d4f017
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f7b3c9a5d2'
+down_revision: Union[str, None] = 'c6e2a8d4f017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows predate presigned uploads and are complete; the server default marks them
+    # uploaded without rewriting the table
+    op.add_column('attachments', sa.Column('storage_key', sa.String(length=1024), nullable=True))
+    op.add_column('attachments', sa.Column('status', sa.String(length=10), server_default='uploaded', nullable=False))
+    op.add_column('attachments', sa.Column('upload_id', sa.String(length=1024), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('attachments', 'upload_id')
+    op.drop_column('attachments', 'status')
+    op.drop_column('attachments', 'storage_key')
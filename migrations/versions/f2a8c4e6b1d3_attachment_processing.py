@@ -0,0 +1,99 @@
+"""Add attachment_jobs and search extracted attachment text
+
+Revision ID: f2a8c4e6b1d3
+Revises: e1f7b3c9a5d2
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c4e6b1d3'
+down_revision: Union[str, None] = 'e1f7b3c9a5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match Note.search_vector
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(attachment_text, '')), 'C')"
+)
+PREVIOUS_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+LIVE_NOTE_SQL = "NOT is_deleted AND NOT is_archived"
+
+
+def _replace_search_vector(expression: str) -> None:
+    # A generated column's expression cannot be altered: drop it (and with it the index) and
+    # add it back, which rewrites the table once, as adding it did
+    op.drop_column('notes', 'search_vector')
+    op.add_column(
+        'notes',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(expression, persisted=True), nullable=True),
+    )
+
+
+def _create_search_index() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_note_live_search_vector',
+            'notes',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text(LIVE_NOTE_SQL),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def upgrade() -> None:
+    op.add_column('attachments', sa.Column('thumbnail_key', sa.String(length=1024), nullable=True))
+    op.add_column('attachments', sa.Column('extracted_text', sa.Text(), nullable=True))
+    op.add_column('attachments', sa.Column('processed_at', sa.TIMESTAMP(), nullable=True))
+
+    op.create_table(
+        'attachment_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('attachment_id', sa.String(length=26), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('finished_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['attachment_id'], ['attachments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('attachment_id'),
+    )
+    op.create_index(
+        'idx_attachment_jobs_due',
+        'attachment_jobs',
+        ['next_attempt_at'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+    op.add_column('notes', sa.Column('attachment_text', sa.Text(), nullable=True))
+    _replace_search_vector(SEARCH_VECTOR_SQL)
+    _create_search_index()
+
+
+def downgrade() -> None:
+    _replace_search_vector(PREVIOUS_SEARCH_VECTOR_SQL)
+    op.drop_column('notes', 'attachment_text')
+    _create_search_index()
+
+    op.drop_index('idx_attachment_jobs_due', table_name='attachment_jobs')
+    op.drop_table('attachment_jobs')
+    op.drop_column('attachments', 'processed_at')
+    op.drop_column('attachments', 'extracted_text')
+    op.drop_column('attachments', 'thumbnail_key')